@@ -1,7 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate, post_save, post_delete
 
 
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
 
+    def ready(self):
+        from django.contrib.auth.models import Group
+        from accounts.groups import create_role_groups, clear_groups
+        import accounts.checks  # noqa: F401
+
+        post_migrate.connect(create_role_groups, sender=self)
+        post_save.connect(clear_groups, sender=Group)
+        post_delete.connect(clear_groups, sender=Group)
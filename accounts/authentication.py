@@ -0,0 +1,26 @@
+from dj_rest_auth.jwt_auth import JWTCookieAuthentication
+from django.core.cache import cache
+from rest_framework_simplejwt.settings import api_settings
+
+from accounts.cache import USER_CACHE_TIMEOUT, get_user_key
+
+
+class CachedJWTCookieAuthentication(JWTCookieAuthentication):
+    """
+    JWTCookieAuthentication 과 같지만 토큰의 사용자를 USER_CACHE_TIMEOUT 동안 캐시해 요청마다 User 를 조회하지 않는다.
+    사용자를 저장하거나 지우면 accounts.models 의 시그널이 캐시를 지운다. 비활성화한 사용자가 다른 워커에서 계속 인증되지 않도록
+    모든 워커가 같은 캐시를 봐야 한다(accounts.checks).
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        key = get_user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            # 없는 사용자, 비활성 사용자는 super() 에서 AuthenticationFailed 가 난다.
+            user = super().get_user(validated_token)
+            cache.set(key, user, USER_CACHE_TIMEOUT)
+        return user
@@ -0,0 +1,25 @@
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from accounts.cache import PERMISSION_CACHE_TIMEOUT, get_permissions_key
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend 와 같지만 사용자의 권한 목록을 캐시에 두고 요청 사이에 재사용한다.
+    그룹, 권한이 바뀌면 accounts.models 의 m2m_changed 시그널이 캐시를 지운다.
+    """
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+
+        # ModelBackend(allauth 의 AuthenticationBackend 포함)는 _perm_cache 가 있으면 DB 를 조회하지 않는다.
+        if not hasattr(user_obj, '_perm_cache'):
+            key = get_permissions_key(user_obj.id)
+            permissions = cache.get(key)
+            if permissions is None:
+                permissions = super().get_all_permissions(user_obj)
+                cache.set(key, permissions, PERMISSION_CACHE_TIMEOUT)
+            user_obj._perm_cache = permissions
+        return user_obj._perm_cache
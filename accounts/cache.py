@@ -0,0 +1,56 @@
+from django.core.cache import cache
+
+# 권한과 그룹은 자주 바뀌지 않는다. 바뀔 때 지우고, 운영에서는 모든 워커가 같은 Redis 캐시(settings.production)를 보므로
+# 한 워커에서 지운 값이 다른 워커에도 바로 반영된다. 만료 시간은 Redis 에 쓰지 못하고 넘어간 경우를 위한 것이다.
+PERMISSION_CACHE_TIMEOUT = 300
+GENERATION_KEY = 'auth:generation'
+# JWT 인증에서 쓰는 사용자 캐시. 사용자를 저장하거나 지우면 바로 지운다.
+USER_CACHE_TIMEOUT = 60
+
+
+def get_generation():
+    # 그룹의 권한이 바뀌면 어떤 사용자가 영향을 받는지 모르므로 세대를 올려 모든 사용자의 캐시를 무효화한다.
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, 1, None)
+        generation = cache.get(GENERATION_KEY, 1)
+    return generation
+
+
+def get_permissions_key(user_id):
+    return 'auth:{}:perms:{}'.format(get_generation(), user_id)
+
+
+def get_group_names_key(user_id):
+    return 'auth:{}:groups:{}'.format(get_generation(), user_id)
+
+
+def get_cached_group_names(user):
+    key = get_group_names_key(user.id)
+    group_names = cache.get(key)
+    if group_names is None:
+        group_names = set(user.groups.values_list('name', flat=True))
+        cache.set(key, group_names, PERMISSION_CACHE_TIMEOUT)
+    return group_names
+
+
+def invalidate_user_permissions(user_ids):
+    keys = []
+    for user_id in user_ids:
+        keys += [get_permissions_key(user_id), get_group_names_key(user_id)]
+    cache.delete_many(keys)
+
+
+def invalidate_all_permissions():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 2, None)
+
+
+def get_user_key(user_id):
+    return 'auth:user:{}'.format(user_id)
+
+
+def invalidate_cached_user(sender, instance, **kwargs):
+    cache.delete(get_user_key(instance.pk))
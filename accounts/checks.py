@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# 프로세스마다 따로 저장하는 캐시. 한 워커에서 지운 사용자, 권한 캐시가 다른 워커에는 남는다.
+PROCESS_LOCAL_CACHES = [
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+]
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES:
+        return []
+    return [
+        Warning(
+            '기본 캐시가 프로세스마다 따로입니다. 사용자, 권한 캐시를 지워도 다른 워커에는 만료될 때까지 남습니다.',
+            hint='워커끼리 나눠 쓰는 캐시(Redis 등)를 CACHES 에 설정하세요.',
+            id='accounts.W001',
+        )
+    ]
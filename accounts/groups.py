@@ -0,0 +1,77 @@
+"""
+역할 그룹(project_leader, project_user, read_only) 레지스트리.
+
+프로젝트 생성, 수정, 회원가입마다 Group.objects.get(name=...) 을 하지 않도록 프로세스 안에 캐시한다.
+migrate(테스트 DB 의 flush 포함) 가 끝나면 없는 그룹을 만들어 ROLE_PERMISSIONS 의 모델 권한을 주고 캐시를 비운다.
+이미 있는 그룹의 권한은 관리자가 정한 것이므로 건드리지 않는다. 그룹을 지우거나 고쳐도 캐시를 비운다.
+"""
+from django.apps import apps
+from django.contrib.auth.management import create_permissions
+from django.contrib.auth.models import Group, Permission
+
+PROJECT_LEADER = 'project_leader'
+PROJECT_USER = 'project_user'
+READ_ONLY = 'read_only'
+ROLE_GROUP_NAMES = [PROJECT_LEADER, PROJECT_USER, READ_ONLY]
+
+# API 가 DjangoModelPermissions 로 확인하는 모델 권한. 어느 프로젝트의 것인지는 각 뷰의 객체 권한(ProjectUsersOnly 등)이 확인한다.
+# 알림 API 는 User 모델의 권한을 본다.
+PROJECT_MODELS = ['issue.project', 'issue.participation', 'issue.team', 'issue.issue', 'issue.comment',
+                  'issue.attachment', 'issue.tag', 'issue.issuetagging']
+WORK_MODELS = ['issue.participation', 'issue.team', 'issue.issue', 'issue.comment', 'issue.attachment', 'issue.tag',
+               'issue.issuetagging']
+
+
+def get_codenames(models, actions):
+    return [(model, '{}_{}'.format(action, model.split('.')[1])) for model in models for action in actions]
+
+
+ROLE_PERMISSIONS = {
+    PROJECT_LEADER: get_codenames(PROJECT_MODELS, ['add', 'change', 'delete', 'view'])
+                    + get_codenames(['accounts.user'], ['change', 'view']),
+    PROJECT_USER: get_codenames(WORK_MODELS, ['add', 'change', 'delete', 'view'])
+                  + get_codenames(['issue.project'], ['add', 'view'])
+                  + get_codenames(['accounts.user'], ['change', 'view']),
+    READ_ONLY: get_codenames(PROJECT_MODELS + ['accounts.user'], ['view']),
+}
+
+_groups = {}
+
+
+def get_group(name):
+    group = _groups.get(name)
+    if group is None:
+        group, created = Group.objects.get_or_create(name=name)
+        # 롤백될 수 있는 트랜잭션 안에서 새로 만든 그룹은 캐시하지 않는다.
+        if not created:
+            _groups[name] = group
+    return group
+
+
+def clear_groups(**kwargs):
+    _groups.clear()
+
+
+def get_permissions(names, using='default'):
+    permissions = []
+    for model, codename in names:
+        app_label, model_name = model.split('.')
+        permissions.append(Permission.objects.using(using).get(
+            content_type__app_label=app_label, content_type__model=model_name, codename=codename))
+    return permissions
+
+
+def create_role_groups(using='default', **kwargs):
+    clear_groups()
+    existing = set(Group.objects.using(using).filter(name__in=ROLE_GROUP_NAMES).values_list('name', flat=True))
+    missing = [name for name in ROLE_GROUP_NAMES if name not in existing]
+    if not missing:
+        return
+
+    # post_migrate 는 INSTALLED_APPS 순서로 불리므로 issue 앱의 권한이 아직 없을 수 있다. 있는 권한은 다시 만들지 않는다.
+    for app_config in apps.get_app_configs():
+        create_permissions(app_config, verbosity=0, using=using)
+
+    for name in missing:
+        group = Group.objects.using(using).create(name=name)
+        group.permissions.set(get_permissions(ROLE_PERMISSIONS[name], using))
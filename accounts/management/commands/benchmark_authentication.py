@@ -0,0 +1,49 @@
+import time
+
+from dj_rest_auth.jwt_auth import JWTCookieAuthentication
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.authentication import CachedJWTCookieAuthentication
+from accounts.cache import get_user_key
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    help = 'JWTCookieAuthentication 과 CachedJWTCookieAuthentication 의 요청당 쿼리 수와 시간을 비교합니다. 만든 사용자는 롤백합니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help='인증할 요청 수')
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        with transaction.atomic():
+            user = User.objects.create(username='benchmark_auth', email='benchmark_auth@example.com')
+            token = str(RefreshToken.for_user(user).access_token)
+            cache.delete(get_user_key(user.id))
+
+            self.stdout.write('{:>32} {:>14} {:>14}'.format('authentication', 'queries/req', 'us/req'))
+            for authentication_class in [JWTCookieAuthentication, CachedJWTCookieAuthentication]:
+                queries, elapsed = self.measure(authentication_class(), token, count)
+                self.stdout.write('{:>32} {:>14.2f} {:>14.1f}'.format(
+                    authentication_class.__name__, queries / count, elapsed / count * 1000000))
+
+            cache.delete(get_user_key(user.id))
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def measure(authentication, token, count):
+        factory = APIRequestFactory()
+        requests = [Request(factory.get('/', HTTP_AUTHORIZATION='Bearer ' + token)) for _ in range(count)]
+
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for request in requests:
+                authentication.authenticate(request)
+            elapsed = time.perf_counter() - start
+        return len(queries), elapsed
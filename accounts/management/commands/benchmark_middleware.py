@@ -0,0 +1,64 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+
+# SessionRoutingMiddleware 를 넣기 전의 미들웨어 순서
+FULL_MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'smallissue.middlewares.csrf_middleware',
+    'corsheaders.middleware.CorsMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'simple_history.middleware.HistoryRequestMiddleware',
+]
+
+
+class Command(BaseCommand):
+    help = '모든 요청에 세션 미들웨어를 실행할 때와 SessionRoutingMiddleware 를 쓸 때의 API 요청 지연 시간을 비교합니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='보낼 요청 수')
+        parser.add_argument('--path', default='/accounts/notifications/unread/', help='요청할 API 경로')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = User.objects.create(username='benchmark_middleware', email='benchmark_middleware@example.com')
+            token = str(RefreshToken.for_user(user).access_token)
+
+            self.stdout.write('{:>10} {:>14} {:>14} {:>14}'.format('middleware', 'p50 ms', 'p95 ms', 'queries/req'))
+            for name, middleware in [('full', FULL_MIDDLEWARE), ('routed', settings.MIDDLEWARE)]:
+                with override_settings(MIDDLEWARE=middleware):
+                    latencies, queries = self.measure(options['path'], token, options['requests'])
+                latencies.sort()
+                self.stdout.write('{:>10} {:>14.2f} {:>14.2f} {:>14.2f}'.format(
+                    name, latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.95)] * 1000,
+                    queries / len(latencies)))
+
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def measure(path, token, count):
+        # 브라우저처럼 access 쿠키와 세션 쿠키를 함께 보낸다.
+        client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        client.cookies[settings.JWT_AUTH_COOKIE] = token
+        client.cookies[settings.SESSION_COOKIE_NAME] = 'benchmark'
+        client.get(path)
+
+        latencies = []
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(count):
+                start = time.perf_counter()
+                client.get(path)
+                latencies.append(time.perf_counter() - start)
+        return latencies, len(queries)
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
+
+class Command(BaseCommand):
+    help = '만료된 OutstandingToken, BlacklistedToken 을 batch-size 개씩 지웁니다. 한 번에 짧은 트랜잭션만 사용합니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='한 트랜잭션에서 지울 토큰 수')
+        parser.add_argument('--pause', type=float, default=0.1, help='배치 사이에 쉴 시간(초)')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='0 보다 크면 종료하지 않고 이 간격(초)마다 다시 지웁니다.')
+
+    def handle(self, *args, **options):
+        while True:
+            purged = self.purge(options['batch_size'], options['pause'])
+            self.stdout.write('만료된 토큰 {}개를 지웠습니다.'.format(purged))
+
+            if options['interval'] <= 0:
+                break
+            close_old_connections()
+            time.sleep(options['interval'])
+
+    @staticmethod
+    def purge(batch_size, pause):
+        now = timezone.now()
+        purged = 0
+        while True:
+            with transaction.atomic():
+                ids = list(OutstandingToken.objects.filter(expires_at__lt=now).order_by('expires_at')
+                           .values_list('id', flat=True)[:batch_size])
+                if not ids:
+                    break
+                BlacklistedToken.objects.filter(token_id__in=ids).delete()
+                OutstandingToken.objects.filter(id__in=ids).delete()
+
+            purged += len(ids)
+            time.sleep(pause)
+
+        return purged
@@ -0,0 +1,50 @@
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.core.management.base import BaseCommand
+from notifications.models import Notification
+
+from accounts.models import User, NotificationState
+
+
+class Command(BaseCommand):
+    help = '사용자별 읽지 않은 알림 수(NotificationState.unread_count)를 실제 알림에서 다시 계산해 어긋난 값을 고칩니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='한 번에 다시 계산할 사용자 수')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        repaired = 0
+        last_id = 0
+
+        while True:
+            user_ids = list(User.objects.filter(id__gt=last_id).order_by('id')
+                            .values_list('id', flat=True)[:batch_size])
+            if not user_ids:
+                break
+            repaired += self.repair(user_ids)
+            last_id = user_ids[-1]
+
+        self.stdout.write('{}명의 읽지 않은 알림 수를 고쳤습니다.'.format(repaired))
+
+    @staticmethod
+    def repair(user_ids):
+        with transaction.atomic():
+            # 계산하는 동안 알림이 만들어지거나 읽혀 다시 어긋나지 않도록 잠근다.
+            states = {state.user_id: state for state in
+                      NotificationState.objects.select_for_update().filter(user_id__in=user_ids).order_by('user_id')}
+            unread = Q(recipient__notification_state=None) | Q(id__gt=F('recipient__notification_state__read_until_id'))
+            counts = dict(Notification.objects.filter(unread, recipient_id__in=user_ids, unread=True)
+                          .values('recipient_id').annotate(count=Count('id')).values_list('recipient_id', 'count'))
+
+            created = [NotificationState(user_id=user_id, unread_count=counts.get(user_id, 0))
+                       for user_id in user_ids if user_id not in states]
+            drifted = []
+            for user_id, state in states.items():
+                if state.unread_count != counts.get(user_id, 0):
+                    state.unread_count = counts.get(user_id, 0)
+                    drifted.append(state)
+
+            NotificationState.objects.bulk_create(created, ignore_conflicts=True)
+            NotificationState.objects.bulk_update(drifted, ['unread_count'])
+            return len(created) + len(drifted)
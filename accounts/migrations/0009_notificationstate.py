@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-18 06:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_alter_userprofile_file'),
+        ('notifications', '0008_index_together_recipient_unread'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationState',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_state', serialize=False, to='accounts.user')),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        # 기존 사용자의 읽지 않은 알림 수를 채운다.
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO accounts_notificationstate (user_id, unread_count)
+                SELECT u.id, COUNT(n.id)
+                FROM accounts_user u
+                LEFT JOIN notifications_notification n ON n.recipient_id = u.id AND n.unread
+                GROUP BY u.id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
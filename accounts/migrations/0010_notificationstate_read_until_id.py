@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-18 06:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_notificationstate'),
+        ('notifications', '0008_index_together_recipient_unread'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationstate',
+            name='read_until_id',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        # 읽지 않은 알림은 recipient_id 로 찾고 id > read_until_id 범위를 id 역순으로 읽는다.
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS notification_recipient_id_idx '
+                'ON notifications_notification (recipient_id, id)',
+            reverse_sql='DROP INDEX IF EXISTS notification_recipient_id_idx',
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+# 사용자 검색(email__icontains, email__istartswith)은 UPPER("email"::text) LIKE 로 컴파일되므로 같은 식에 인덱스를 건다.
+# pg_trgm 이 없는 서버에서는 앞부분 일치 인덱스만 만든다. Postgres 가 아니면 아무것도 하지 않는다.
+def create_email_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        has_trgm = cursor.fetchone() is not None
+
+    schema_editor.execute('CREATE INDEX IF NOT EXISTS accounts_user_email_prefix_idx '
+                          'ON accounts_user (UPPER(email::text) text_pattern_ops)')
+    if has_trgm:
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute('CREATE INDEX IF NOT EXISTS accounts_user_email_trgm_idx '
+                              'ON accounts_user USING gin (UPPER(email::text) gin_trgm_ops)')
+
+
+def drop_email_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('DROP INDEX IF EXISTS accounts_user_email_trgm_idx')
+    schema_editor.execute('DROP INDEX IF EXISTS accounts_user_email_prefix_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_notificationstate_read_until_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_email_search_indexes, drop_email_search_indexes),
+    ]
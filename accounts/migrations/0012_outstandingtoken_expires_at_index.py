@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_user_email_search_indexes'),
+        ('token_blacklist', '0011_linearizes_history'),
+    ]
+
+    operations = [
+        # purge_expired_tokens 가 만료된 토큰을 나눠 지울 때 테이블 전체를 읽지 않도록 한다.
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS outstandingtoken_expires_at_idx '
+                'ON token_blacklist_outstandingtoken (expires_at)',
+            reverse_sql='DROP INDEX IF EXISTS outstandingtoken_expires_at_idx',
+        ),
+    ]
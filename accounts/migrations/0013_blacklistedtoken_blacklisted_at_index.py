@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_outstandingtoken_expires_at_index'),
+    ]
+
+    operations = [
+        # 블룸 필터가 최근에 블랙리스트에 들어간 토큰을 다시 읽을 때 테이블 전체를 읽지 않도록 한다.
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS blacklistedtoken_blacklisted_at_idx '
+                'ON token_blacklist_blacklistedtoken (blacklisted_at)',
+            reverse_sql='DROP INDEX IF EXISTS blacklistedtoken_blacklisted_at_idx',
+        ),
+    ]
@@ -1,6 +1,13 @@
-from django.db import models
-from django.db.models.signals import post_save
-from django.contrib.auth.models import AbstractUser, BaseUserManager, Group
+from collections import defaultdict
+
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_save, m2m_changed, post_delete
+from django.contrib.auth.models import AbstractUser, BaseUserManager, Group, Permission
+
+from accounts.cache import invalidate_user_permissions, invalidate_all_permissions, invalidate_cached_user
+from accounts.groups import get_group, PROJECT_USER
 
 
 class UserManager(BaseUserManager):
@@ -59,13 +66,118 @@ class UserProfile(models.Model):
     file = models.ImageField(upload_to=user_directory_path, blank=False, null=False)
 
 
+class NotificationState(models.Model):
+    # 읽지 않은 알림 수. 알림 목록을 폴링할 때마다 COUNT 하지 않도록 알림을 만들고 읽을 때 함께 갱신한다.
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_state')
+    unread_count = models.PositiveIntegerField(default=0)
+    # 모두 읽음 표시한 시점의 마지막 알림 id. 이 값보다 id 가 큰 알림 중 unread 인 것만 읽지 않은 알림이다.
+    read_until_id = models.PositiveBigIntegerField(default=0)
+
+
+def get_notification_state(user_id):
+    return NotificationState.objects.filter(user_id=user_id).first() or NotificationState(user_id=user_id)
+
+
+def get_unread_notification_queryset(user_id, read_until_id):
+    from notifications.models import Notification
+
+    return Notification.objects.filter(recipient_id=user_id, id__gt=read_until_id, unread=True).order_by('-id')
+
+
+def increment_unread_counts(recipient_ids):
+    """
+    알림을 받을 사용자의 unread_count 를 받을 수만큼 늘린다. 알림을 만드는 트랜잭션 안에서 알림을 INSERT 하기 전에 호출한다.
+    recipient_ids 는 알림 하나당 수신자 id 하나이다.
+    """
+    counts = defaultdict(int)
+    for recipient_id in recipient_ids:
+        counts[recipient_id] += 1
+    if not counts:
+        return
+
+    NotificationState.objects.bulk_create([NotificationState(user_id=user_id) for user_id in counts],
+                                          ignore_conflicts=True)
+
+    # 같은 수만큼 늘어나는 사용자끼리 묶어서 UPDATE 한다. 보통은 한 번이다.
+    # 먼저 NotificationState 행을 잠가 두면, 모두 읽음 표시가 끝난 뒤에 알림 id 가 발급되므로 read_until_id 에 가려지지 않는다.
+    users_by_count = defaultdict(list)
+    for user_id, count in counts.items():
+        users_by_count[count].append(user_id)
+    for count, user_ids in users_by_count.items():
+        NotificationState.objects.filter(user_id__in=sorted(user_ids)) \
+            .update(unread_count=F('unread_count') + count)
+
+
+def mark_notification_as_read(user_id, notification_id):
+    """
+    알림 하나를 읽음으로 바꾸고 unread_count 를 줄인다. 알림이 없으면 Notification.DoesNotExist 를 일으킨다.
+    """
+    from notifications.models import Notification
+
+    with transaction.atomic():
+        state = NotificationState.objects.select_for_update().filter(user_id=user_id).first()
+        notifications = Notification.objects.filter(id=notification_id, recipient_id=user_id)
+        read_until_id = state.read_until_id if state else 0
+
+        updated = notifications.filter(unread=True, id__gt=read_until_id).update(unread=False)
+        if not updated and not notifications.exists():
+            raise Notification.DoesNotExist
+        if updated and state:
+            NotificationState.objects.filter(user_id=user_id) \
+                .update(unread_count=Greatest(F('unread_count') - updated, 0))
+
+
+def mark_all_notifications_as_read(user_id):
+    """
+    알림 행은 건드리지 않고 read_until_id 를 마지막 알림 id 로 옮긴다. NotificationState 한 행만 갱신한다.
+    """
+    from notifications.models import Notification
+
+    with transaction.atomic():
+        # 행을 먼저 잠근 뒤에 마지막 id 를 읽어야 알림을 만들고 있는 트랜잭션이 커밋한 알림까지 포함된다.
+        # bulk_create 로 만든 사용자처럼 행이 없으면 여기서 만든다.
+        NotificationState.objects.select_for_update().get_or_create(user_id=user_id)
+        last_id = Notification.objects.filter(recipient_id=user_id).order_by('-id') \
+            .values_list('id', flat=True).first()
+        if last_id is not None:
+            NotificationState.objects.filter(user_id=user_id) \
+                .update(read_until_id=Greatest(F('read_until_id'), last_id), unread_count=0)
+
+
 def add_profile_and_group(sender, instance, created, **kwargs):
     if created:
         profile = UserProfile(user=instance)
         profile.save()
+        NotificationState.objects.create(user=instance)
 
-        group = Group.objects.get(name='project_user')
-        instance.groups.add(group)
+        instance.groups.add(get_group(PROJECT_USER))
 
 
 post_save.connect(add_profile_and_group, sender=User)
+# 비활성화를 포함해 사용자가 바뀌면 JWT 인증의 사용자 캐시를 지운다.
+post_save.connect(invalidate_cached_user, sender=User)
+post_delete.connect(invalidate_cached_user, sender=User)
+
+
+def invalidate_permission_cache(sender, instance, action, model, pk_set, **kwargs):
+    # groups.add/remove, user_permissions, 그룹 권한이 바뀌면 accounts.backends.CachedModelBackend 의 캐시를 지운다.
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if isinstance(instance, User):
+        invalidate_user_permissions([instance.id])
+    elif model is User and pk_set:
+        invalidate_user_permissions(pk_set)
+    else:
+        invalidate_all_permissions()
+
+
+def invalidate_all_permission_cache(sender, **kwargs):
+    invalidate_all_permissions()
+
+
+m2m_changed.connect(invalidate_permission_cache, sender=User.groups.through)
+m2m_changed.connect(invalidate_permission_cache, sender=User.user_permissions.through)
+m2m_changed.connect(invalidate_permission_cache, sender=Group.permissions.through)
+post_delete.connect(invalidate_all_permission_cache, sender=Group)
+post_delete.connect(invalidate_all_permission_cache, sender=Permission)
@@ -1,9 +1,14 @@
-from django.contrib.auth import get_user_model
+from dj_rest_auth.jwt_auth import CookieTokenRefreshSerializer
 from django.contrib.auth.models import Group
 from rest_framework import serializers
+from rest_framework_simplejwt.settings import api_settings
 
+from accounts.cache import get_cached_group_names
+from accounts.groups import READ_ONLY
 from accounts.models import User, UserProfile
-from issue.models import IssueHistory, Issue
+from accounts.tokens import RefreshToken
+from issue.models import Issue
+from smallissue.utils import prefetch_generic_foreign_key
 
 
 class ProfileSerializer(serializers.ModelSerializer):
@@ -30,7 +35,7 @@ class UserDetailSerializer(serializers.ModelSerializer):
                   'is_readonly']
 
     def get_is_readonly(self, obj):
-        return obj.groups.filter(name='read_only').exists()
+        return READ_ONLY in get_cached_group_names(obj)
 
 
 class DisplayUserSerializer(serializers.Serializer):
@@ -43,26 +48,73 @@ class NotificationIssueHistorySerializer(serializers.Serializer):
     issue = serializers.SerializerMethodField()
 
     def get_issue(self, obj):
+        issues = self.context.get('issues')
         try:
-            issue = Issue.objects.get(id=obj.issue_id)
+            issue = issues[obj.issue_id] if issues is not None else Issue.all_objects.get(id=obj.issue_id)
             # change = get_change_from_histories([obj])[0]
             return {'id': issue.id, 'key': issue.key, 'title': issue.title,
-                    'project_id': issue.project.id}  # change
+                    'project_id': issue.project_id}  # change
 
-        except Issue.DoesNotExist:
+        except (Issue.DoesNotExist, KeyError):
             raise ValueError('알림의 이슈가 존재하지 않습니다.')
 
 
 class NotificationSerializer(serializers.Serializer):
     id = serializers.PrimaryKeyRelatedField(read_only=True)
-    actor = DisplayUserSerializer(get_user_model(), read_only=True)
+    actor = serializers.SerializerMethodField()
     unread = serializers.BooleanField()
     timestamp = serializers.DateTimeField()
-    target = NotificationIssueHistorySerializer(IssueHistory)
+    target = serializers.SerializerMethodField()
     description = serializers.CharField()
 
+    # 보낼 때 data 에 저장해 둔 값으로 그린다. data 가 없는 예전 알림만 actor, target 을 조회한다.
+    def get_actor(self, obj):
+        if has_issue_data(obj):
+            return obj.data['actor']
+        return DisplayUserSerializer(obj.actor).data
+
+    def get_target(self, obj):
+        if has_issue_data(obj):
+            return {'history_id': obj.data['history_id'], 'issue': obj.data['issue']}
+        if obj.target is None:
+            return None
+        return NotificationIssueHistorySerializer(obj.target, context=self.context).data
+
+
+def has_issue_data(notification):
+    return bool(notification.data) and 'issue' in notification.data
+
+
+def get_notification_serializer_context(notifications):
+    # data 가 없는 예전 알림의 actor, target(IssueHistory), 이슈를 종류별로 한 번씩만 조회한다.
+    notifications = [n for n in notifications if not has_issue_data(n)]
+    if not notifications:
+        return {}
+
+    prefetch_generic_foreign_key(notifications, 'actor')
+    prefetch_generic_foreign_key(notifications, 'target')
+
+    issue_ids = {n.target.issue_id for n in notifications if n.target is not None}
+    return {'issues': Issue.all_objects.in_bulk(issue_ids)}
+
 
 class UserSearchResultSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email']
+
+
+class RefreshTokenSerializer(CookieTokenRefreshSerializer):
+    # dj-rest-auth 의 토큰 갱신과 같지만 블랙리스트 확인에 블룸 필터를 쓰는 accounts.tokens.RefreshToken 을 사용한다.
+    def validate(self, attrs):
+        refresh = RefreshToken(self.extract_refresh_token())
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            data['refresh'] = str(refresh)
+
+        return data
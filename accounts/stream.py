@@ -0,0 +1,264 @@
+"""
+알림 스트림(Server-Sent Events).
+
+브라우저마다 연결 하나를 열어 두고, 알림이 만들어지면 바로 보낸다. /accounts/notifications/unread/ 폴링은
+연결이 끊겼을 때 쓰는 대체 수단으로 남겨 둔다.
+
+알림을 만드는 쪽(run_outbox 워커)과 연결을 가진 ASGI 프로세스는 다르므로 Postgres LISTEN/NOTIFY 로 전달한다.
+NOTIFY 는 트랜잭션이 커밋될 때 전달되므로 롤백된 알림은 보내지 않는다.
+NOTIFICATION_STREAM_BACKEND = 'local' 이거나 DB 가 Postgres 가 아니면 같은 프로세스 안에서만 전달한다(개발, 테스트용).
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict
+from http.cookies import SimpleCookie
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_STREAM_PATH = '/accounts/notifications/stream/'
+NOTIFICATION_CHANNEL = 'notifications'
+# pg_notify 페이로드는 8000 바이트를 넘을 수 없다.
+MAX_PAYLOAD_BYTES = 7500
+# 연결 하나가 쌓아 둘 수 있는 알림 수. 넘치면 버리고, 브라우저는 폴링으로 맞춘다.
+QUEUE_SIZE = 100
+
+
+def get_stream_backend():
+    # LISTEN/NOTIFY 는 Postgres 에만 있다.
+    if connection.vendor != 'postgresql':
+        return 'local'
+    return settings.NOTIFICATION_STREAM_BACKEND
+
+
+def publish_notifications(notifications):
+    """
+    알림을 만드는 트랜잭션 안에서 호출한다. data 가 없는 예전 형식의 알림은 보내지 않는다.
+    """
+    from accounts.serializers import NotificationSerializer, has_issue_data
+
+    notifications = fill_inserted_ids([n for n in notifications if has_issue_data(n)])
+    messages = [json.dumps([n.recipient_id, NotificationSerializer(n).data], ensure_ascii=False)
+                for n in notifications]
+    payloads = list(pack_payloads(messages))
+    if not payloads:
+        return
+
+    if get_stream_backend() == 'postgres':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload',
+                           [NOTIFICATION_CHANNEL, payloads])
+    else:
+        transaction.on_commit(lambda: [broker.publish_local(payload) for payload in payloads])
+
+
+def fill_inserted_ids(notifications):
+    """
+    bulk_create 가 id 를 돌려주지 않는 DB(SQLite 등)에서는 같은 트랜잭션에서 방금 넣은 행을 다시 읽어 id 를 채운다.
+    한 번에 만든 알림은 수신자, 대상, 동사, 시각으로 구별된다. 찾지 못한 알림은 빼고 돌려준다.
+    """
+    from notifications.models import Notification
+
+    missing = [n for n in notifications if n.pk is None]
+    if not missing:
+        return notifications
+
+    def get_key(n):
+        return n.recipient_id, n.target_content_type_id, str(n.target_object_id), n.verb, n.timestamp
+
+    rows = Notification.objects.filter(recipient_id__in={n.recipient_id for n in missing},
+                                       timestamp__in={n.timestamp for n in missing})
+    ids = {get_key(row): row.pk for row in rows}
+    for n in missing:
+        n.pk = ids.get(get_key(n))
+    return [n for n in notifications if n.pk is not None]
+
+
+def pack_payloads(messages):
+    # [[user_id, notification], ...] 형태의 JSON 을 MAX_PAYLOAD_BYTES 이하로 나눈다.
+    chunk, size = [], 2
+    for message in messages:
+        message_size = len(message.encode()) + 1
+        if chunk and size + message_size > MAX_PAYLOAD_BYTES:
+            yield '[' + ','.join(chunk) + ']'
+            chunk, size = [], 2
+        chunk.append(message)
+        size += message_size
+    if chunk:
+        yield '[' + ','.join(chunk) + ']'
+
+
+class NotificationBroker:
+    """
+    프로세스 하나에 하나. 사용자별로 열린 연결의 큐를 들고 있다가 받은 알림을 나눠 준다.
+    """
+
+    def __init__(self):
+        self.queues = defaultdict(set)
+        self.loop = None
+        self.listener = None
+
+    def subscribe(self, user_id):
+        self.loop = asyncio.get_running_loop()
+        if get_stream_backend() == 'postgres' and (self.listener is None or self.listener.done()):
+            self.listener = self.loop.create_task(self.listen())
+
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.queues[user_id].add(queue)
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        self.queues[user_id].discard(queue)
+        if not self.queues[user_id]:
+            del self.queues[user_id]
+
+    def dispatch(self, payload):
+        for user_id, notification in json.loads(payload):
+            for queue in self.queues.get(user_id, ()):
+                try:
+                    queue.put_nowait(notification)
+                except asyncio.QueueFull:
+                    pass
+
+    def publish_local(self, payload):
+        # 동기 코드(요청, 워커 스레드)에서 호출되므로 이벤트 루프 스레드로 넘긴다.
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.dispatch, payload)
+
+    async def listen(self):
+        retry = 1
+        while True:
+            conn = None
+            try:
+                conn = await self.loop.run_in_executor(None, self.connect)
+                retry = 1
+                await self.read_notifies(conn)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('notification listener disconnected')
+            finally:
+                if conn is not None:
+                    self.loop.remove_reader(conn.fileno())
+                    conn.close()
+
+            await asyncio.sleep(retry)
+            retry = min(retry * 2, 30)
+
+    @staticmethod
+    def connect():
+        wrapper = connections['default']
+        conn = wrapper.get_new_connection(wrapper.get_connection_params())
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute('LISTEN ' + NOTIFICATION_CHANNEL)
+        return conn
+
+    def read_notifies(self, conn):
+        # 연결이 읽을 수 있게 될 때만 깨어난다. 연결이 끊기면 future 가 예외로 끝난다.
+        closed = self.loop.create_future()
+
+        def on_readable():
+            try:
+                conn.poll()
+            except Exception as e:
+                if not closed.done():
+                    closed.set_exception(e)
+                return
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                try:
+                    self.dispatch(notify.payload)
+                except (ValueError, TypeError):
+                    logger.warning('invalid notification payload: %s', notify.payload[:100])
+
+        self.loop.add_reader(conn.fileno(), on_readable)
+        return closed
+
+
+broker = NotificationBroker()
+
+
+def authenticate(scope):
+    """
+    access 쿠키의 JWT 를 검증해 (user_id, 만료 시각) 을 돌려준다. DB 는 조회하지 않는다.
+    """
+    from rest_framework_simplejwt.exceptions import TokenError
+    from rest_framework_simplejwt.settings import api_settings
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    cookie = SimpleCookie()
+    for name, value in scope.get('headers', []):
+        if name == b'cookie':
+            cookie.load(value.decode('latin1'))
+
+    morsel = cookie.get(settings.JWT_AUTH_COOKIE)
+    if morsel is None:
+        return None, None
+    try:
+        token = AccessToken(morsel.value)
+        return token[api_settings.USER_ID_CLAIM], token['exp']
+    except (TokenError, KeyError):
+        return None, None
+
+
+def get_cors_headers(scope):
+    origin = dict(scope.get('headers', [])).get(b'origin', b'').decode('latin1')
+    if origin not in settings.CORS_ALLOWED_ORIGINS:
+        return []
+    return [(b'access-control-allow-origin', origin.encode('latin1')),
+            (b'access-control-allow-credentials', b'true'),
+            (b'vary', b'Origin')]
+
+
+async def notification_stream(scope, receive, send):
+    user_id, expires_at = authenticate(scope)
+    if user_id is None:
+        await send({'type': 'http.response.start', 'status': 401, 'headers': get_cors_headers(scope)})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    queue = broker.subscribe(user_id)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', b'text/event-stream'),
+                        (b'cache-control', b'no-cache'),
+                        (b'x-accel-buffering', b'no')] + get_cors_headers(scope),
+        })
+        await send({'type': 'http.response.body', 'body': b'retry: 5000\n\n', 'more_body': True})
+
+        # 토큰이 만료되면 연결을 끊는다. 브라우저는 새 토큰으로 다시 연결한다.
+        while not disconnected.done() and time.time() < expires_at:
+            timeout = min(settings.NOTIFICATION_STREAM_HEARTBEAT, max(expires_at - time.time(), 0))
+            getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait([getter, disconnected], timeout=timeout,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                notification = getter.result()
+                body = 'id: {}\nevent: notification\ndata: {}\n\n'.format(
+                    notification['id'], json.dumps(notification, ensure_ascii=False))
+            else:
+                getter.cancel()
+                body = ': ping\n\n'
+            if not disconnected.done():
+                await send({'type': 'http.response.body', 'body': body.encode(), 'more_body': True})
+
+        if not disconnected.done():
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        disconnected.cancel()
+        broker.unsubscribe(user_id, queue)
+
+
+async def wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
@@ -1,6 +1,28 @@
+import asyncio
+import io
+import json
+from datetime import timedelta
+
 from django.conf import settings
+from django.contrib.auth.models import Permission, Group
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APITestCase, APIClient
-from accounts.models import User
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from accounts.models import User, NotificationState
+from accounts.groups import get_group, create_role_groups, ROLE_GROUP_NAMES, PROJECT_LEADER, PROJECT_USER, READ_ONLY
+from accounts.serializers import UserDetailSerializer
+from accounts.tokens import RefreshToken as AccountsRefreshToken, blacklist_filter
+from accounts.stream import NOTIFICATION_STREAM_PATH, notification_stream
+from accounts.checks import check_shared_cache
+from issue.models import Project, Issue, Team, Participation, IssueEventOutbox, IssueHistory
+from issue.notifications import bulk_notify
+from notifications.signals import notify
 
 
 class UserTestCase(APITestCase):
@@ -26,3 +48,408 @@ class UserTestCase(APITestCase):
         user = User.objects.get(email=email)
         self.assertIsNotNone(user.profile)
 
+
+
+class NotificationTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.actor = User.objects.create(email='actor@test.com', username='actor')
+        cls.subscriber = User.objects.create(email='subscriber@test.com', username='subscriber')
+        project = Project.objects.create(name='project1', key='PJ', leader=cls.actor)
+        cls.issue = Issue(title='issue', project=project, author=cls.actor)
+        cls.issue._history_user = cls.actor
+        cls.issue.save()
+        call_command('run_outbox', '--once', stdout=io.StringIO())
+        cls.issue.subscribers.add(cls.subscriber)
+
+    def login(self, user):
+        access_token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+
+    def update_issue(self, count):
+        for i in range(count):
+            self.issue.title = f'{self.issue.title}{i}'
+            self.issue.save()
+        call_command('run_outbox', '--once', stdout=io.StringIO())
+
+    def test_이슈변경은_아웃박스를_거쳐_구독자에게_알림으로_전달된다(self):
+        self.issue.title = 'changed'
+        self.issue.save()
+        self.assertEqual(IssueEventOutbox.objects.count(), 1)
+        self.assertEqual(self.subscriber.notifications.count(), 0)
+
+        call_command('run_outbox', '--once', stdout=io.StringIO())
+        self.assertEqual(IssueEventOutbox.objects.count(), 0)
+        self.assertEqual(self.subscriber.notifications.count(), 1)
+        self.assertEqual(self.actor.notifications.count(), 0)
+
+    def test_대량알림은_구독자수와_무관하게_한번에_저장된다(self):
+        User.objects.bulk_create([User(email=f'user{i}@test.com', username=f'user{i}') for i in range(30)])
+        # bulk_create 는 DB 에 따라(SQLite 등) pk 를 채우지 않으므로 다시 읽는다.
+        recipients = list(User.objects.filter(email__in=[f'user{i}@test.com' for i in range(30)]).order_by('id'))
+        target = IssueHistory.objects.filter(issue_id=self.issue.id).first()
+        with CaptureQueriesContext(connection) as queries:
+            bulk_notify(self.actor, [user.id for user in recipients], '업데이트', target, '이슈를 업데이트했습니다.')
+        inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "notifications_notification"')]
+        self.assertEqual(len(inserts), 1)
+
+        notification = recipients[0].notifications.get()
+        self.assertEqual(notification.actor, self.actor)
+        self.assertEqual(notification.target, target)
+        self.assertEqual(notification.verb, '업데이트')
+
+    def test_읽지않은_알림목록_쿼리수는_알림개수와_무관하다(self):
+        self.login(self.subscriber)
+        self.update_issue(1)
+        self.client.get('/accounts/notifications/unread/')  # 토큰의 사용자를 캐시해 둔다.
+        with CaptureQueriesContext(connection) as small:
+            res = self.client.get('/accounts/notifications/unread/')
+        self.assertEqual(len(res.data['unread_list']), 1)
+
+        self.update_issue(4)
+        with CaptureQueriesContext(connection) as large:
+            res = self.client.get('/accounts/notifications/unread/')
+        self.assertEqual(len(res.data['unread_list']), 5)
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(res.data['unread_list'][0]['target']['issue']['id'], self.issue.id)
+        self.assertEqual(res.data['unread_list'][0]['actor']['username'], 'actor')
+
+    def test_읽지않은_알림목록은_알림테이블만_조회한다(self):
+        self.login(self.subscriber)
+        self.update_issue(3)
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get('/accounts/notifications/unread/')
+
+        tables = ' '.join(query['sql'] for query in queries)
+        self.assertIn('notifications_notification', tables)
+        self.assertNotIn('issue_issue', tables)
+        self.assertNotIn('django_content_type', tables)
+        self.assertEqual(res.data['unread_list'][0]['target']['issue']['key'], self.issue.key)
+        self.assertEqual(res.data['unread_list'][0]['actor'], {'id': self.actor.id, 'username': 'actor'})
+
+    def test_data가_없는_예전알림도_같은형태로_보여준다(self):
+        self.login(self.subscriber)
+        self.update_issue(1)
+        target = IssueHistory.objects.filter(issue_id=self.issue.id).last()
+        notify.send(self.actor, recipient=self.subscriber, verb='업데이트', target=target,
+                    description='이슈를 업데이트했습니다.')
+
+        res = self.client.get('/accounts/notifications/unread/')
+        legacy, new = res.data['unread_list']
+        self.assertEqual(legacy['actor'], new['actor'])
+        self.assertEqual(legacy['target']['issue'], new['target']['issue'])
+
+    def test_읽지않은_알림수는_목록개수와_무관한_전체개수다(self):
+        self.subscriber.user_permissions.add(Permission.objects.get(codename='change_user'))
+        self.login(self.subscriber)
+        self.update_issue(12)
+        res = self.client.get('/accounts/notifications/unread/')
+        self.assertEqual(len(res.data['unread_list']), 10)
+        self.assertEqual(res.data['unread_count'], 12)
+
+        self.client.patch(f"/accounts/notifications/mark_as_read/{res.data['unread_list'][0]['id']}/")
+        self.client.patch(f"/accounts/notifications/mark_as_read/{res.data['unread_list'][0]['id']}/")
+        self.assertEqual(self.client.get('/accounts/notifications/unread/').data['unread_count'], 11)
+
+        self.client.patch('/accounts/notifications/mark_all_as_read/')
+        self.assertEqual(self.client.get('/accounts/notifications/unread/').data['unread_count'], 0)
+
+    def test_모두읽음은_알림행을_갱신하지_않고_이후알림만_읽지않음으로_보여준다(self):
+        self.subscriber.user_permissions.add(Permission.objects.get(codename='change_user'))
+        self.login(self.subscriber)
+        self.update_issue(5)
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch('/accounts/notifications/mark_all_as_read/')
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse([q for q in queries if q['sql'].startswith('UPDATE "notifications_notification"')])
+
+        res = self.client.get('/accounts/notifications/unread/')
+        self.assertEqual((res.data['unread_count'], res.data['unread_list']), (0, []))
+
+        self.update_issue(2)
+        res = self.client.get('/accounts/notifications/unread/')
+        self.assertEqual((res.data['unread_count'], len(res.data['unread_list'])), (2, 2))
+
+    def test_알림상태_행이_없어도_모두읽음을_기록한다(self):
+        self.subscriber.user_permissions.add(Permission.objects.get(codename='change_user'))
+        self.login(self.subscriber)
+        self.update_issue(2)
+        NotificationState.objects.filter(user=self.subscriber).delete()
+
+        self.assertEqual(self.client.patch('/accounts/notifications/mark_all_as_read/').status_code, 200)
+        res = self.client.get('/accounts/notifications/unread/')
+        self.assertEqual((res.data['unread_count'], res.data['unread_list']), (0, []))
+
+    def test_읽음기준이_다른_inbox_경로는_열지_않는다(self):
+        self.update_issue(1)
+        notification = self.subscriber.notifications.get()
+        self.client.force_login(self.subscriber)
+        for path in ['/inbox/notifications/unread/', '/inbox/notifications/mark-all-as-read/',
+                     f'/inbox/notifications/mark-as-read/{notification.slug}/']:
+            with self.subTest(path):
+                self.assertEqual(self.client.get(path).status_code, 404)
+        self.assertEqual(NotificationState.objects.get(user=self.subscriber).unread_count, 1)
+
+    def test_어긋난_읽지않은_알림수를_다시_계산한다(self):
+        self.update_issue(3)
+        last_id = self.subscriber.notifications.order_by('id').values_list('id', flat=True).first()
+        NotificationState.objects.filter(user=self.subscriber).update(unread_count=100, read_until_id=last_id)
+        NotificationState.objects.filter(user=self.actor).delete()
+
+        call_command('repair_unread_counts', '--batch-size', '1', stdout=io.StringIO())
+        self.assertEqual(NotificationState.objects.get(user=self.subscriber).unread_count, 2)
+        self.assertEqual(NotificationState.objects.get(user=self.actor).unread_count, 0)
+
+    @override_settings(NOTIFICATION_STREAM_BACKEND='local')
+    def test_알림스트림은_커밋된_알림을_구독자에게_보낸다(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.update_issue(1)
+        notification = self.subscriber.notifications.get()
+
+        token = RefreshToken.for_user(self.subscriber).access_token
+        scope = {'type': 'http', 'path': NOTIFICATION_STREAM_PATH,
+                 'headers': [(b'cookie', f'access={token}'.encode())]}
+        messages = []
+
+        async def scenario():
+            received = asyncio.Event()
+
+            async def receive():
+                await received.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                messages.append(message)
+                if b'event: notification' in message.get('body', b''):
+                    received.set()
+
+            stream = asyncio.ensure_future(notification_stream(scope, receive, send))
+            await asyncio.sleep(0)
+            for callback in callbacks:
+                callback()
+            await asyncio.wait_for(stream, timeout=5)
+
+        asyncio.run(scenario())
+        self.assertEqual(messages[0]['status'], 200)
+        event = next(m['body'].decode() for m in messages if b'event: notification' in m.get('body', b''))
+        data = json.loads(event.split('data: ', 1)[1])
+        self.assertEqual(data['id'], notification.id)
+        self.assertEqual(data['target']['issue']['id'], self.issue.id)
+
+    def test_알림스트림은_토큰이_없으면_401을_돌려준다(self):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(notification_stream({'type': 'http', 'path': NOTIFICATION_STREAM_PATH, 'headers': []}, None, send))
+        self.assertEqual(messages[0]['status'], 401)
+
+
+class SearchUserTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='leader@test.com', username='leader')
+        cls.project = Project.objects.create(name='project1', key='PJ', leader=cls.user)
+        cls.member = User.objects.create(email='Member@test.com', username='member')
+        cls.outsider = User.objects.create(email='outsider.member@test.com', username='outsider')
+        Participation.objects.create(project=cls.project, user=cls.member)
+        cls.team = Team.objects.create(project=cls.project, name='team1')
+
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def search(self, **params):
+        res = self.client.get('/accounts/search/', {'project': self.project.id, **params})
+        return [user['email'] for user in res.data]
+
+    def test_이메일_검색은_대소문자를_무시하고_앞부분일치를_먼저_보여준다(self):
+        self.assertEqual(self.search(email='member', filter='exclude'), ['outsider.member@test.com'])
+        User.objects.create(email='member2@test.com', username='member2')
+        self.assertEqual(self.search(email='MEMBER', filter='exclude'),
+                         ['member2@test.com', 'outsider.member@test.com'])
+        self.assertEqual(self.search(email='me', filter='include'), ['Member@test.com'])
+
+    def test_팀_조건으로_사용자를_거른다(self):
+        self.team.users.add(self.member)
+        self.assertEqual(self.search(email='member', filter='include', team=f'+{self.team.id}'), ['Member@test.com'])
+        self.assertEqual(self.search(email='member', filter='include', team=f'-{self.team.id}'), [])
+
+    def test_filter가_없으면_400을_돌려준다(self):
+        res = self.client.get('/accounts/search/', {'email': 'member'})
+        self.assertEqual(res.status_code, 400)
+
+
+class PermissionCacheTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='user@test.com', username='user')
+        # 역할 그룹의 권한을 빼고 시험용 그룹의 권한만 갖게 한다.
+        cls.user.groups.clear()
+        cls.group = Group.objects.create(name='notification_editor')
+        cls.group.permissions.add(Permission.objects.get(codename='change_user'))
+
+    def setUp(self):
+        cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def mark_all_as_read(self):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch('/accounts/notifications/mark_all_as_read/')
+        return res.status_code, [q for q in queries if 'auth_permission' in q['sql'] or 'auth_group' in q['sql']]
+
+    def test_권한은_요청사이에_캐시되고_그룹이_바뀌면_다시_읽는다(self):
+        self.user.groups.add(self.group)
+        status_code, permission_queries = self.mark_all_as_read()
+        self.assertEqual(status_code, 200)
+        self.assertTrue(permission_queries)
+
+        status_code, permission_queries = self.mark_all_as_read()
+        self.assertEqual((status_code, permission_queries), (200, []))
+
+        self.user.groups.remove(self.group)
+        self.assertEqual(self.mark_all_as_read()[0], 403)
+
+    def test_그룹의_권한이_바뀌면_캐시를_다시_읽는다(self):
+        self.user.groups.add(self.group)
+        self.assertEqual(self.mark_all_as_read()[0], 200)
+
+        self.group.permissions.clear()
+        self.assertEqual(self.mark_all_as_read()[0], 403)
+
+    def test_읽기전용_여부는_그룹변경을_반영한다(self):
+        read_only = Group.objects.get(name='read_only')
+        self.assertFalse(UserDetailSerializer(self.user).data['is_readonly'])
+        self.user.groups.add(read_only)
+        self.assertTrue(UserDetailSerializer(self.user).data['is_readonly'])
+
+
+class RoleGroupTestCase(APITestCase):
+    def test_역할그룹은_마이그레이션때_만들어지고_캐시된다(self):
+        self.assertEqual(Group.objects.filter(name__in=ROLE_GROUP_NAMES).count(), 3)
+        group = get_group(PROJECT_USER)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_group(PROJECT_USER), group)
+
+    def test_역할그룹은_마이그레이션때_모델권한을_받는다(self):
+        def codenames(name):
+            return set(get_group(name).permissions.values_list('codename', flat=True))
+
+        self.assertTrue({'add_project', 'add_issue', 'change_user'} <= codenames(PROJECT_USER))
+        self.assertNotIn('delete_project', codenames(PROJECT_USER))
+        self.assertTrue({'change_project', 'delete_project'} <= codenames(PROJECT_LEADER))
+        self.assertTrue(all(codename.startswith('view_') for codename in codenames(READ_ONLY)))
+
+    def test_다시_마이그레이션해도_관리자가_뺀_권한을_다시_주지_않는다(self):
+        group = get_group(PROJECT_USER)
+        group.permissions.remove(Permission.objects.get(codename='add_project'))
+        create_role_groups()
+        self.assertFalse(group.permissions.filter(codename='add_project').exists())
+
+    def test_그룹을_지우면_캐시를_비운다(self):
+        get_group(READ_ONLY).delete()
+        group = get_group(READ_ONLY)
+        self.assertTrue(Group.objects.filter(id=group.id).exists())
+
+
+class CachedJWTAuthenticationTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='user@test.com', username='user')
+
+    def setUp(self):
+        cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def user_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get('/accounts/notifications/unread/')
+        return res.status_code, [q for q in queries if 'FROM "accounts_user"' in q['sql']]
+
+    def test_토큰의_사용자는_캐시되고_비활성화하면_다시_조회한다(self):
+        status_code, queries = self.user_queries()
+        self.assertEqual((status_code, len(queries)), (200, 1))
+        status_code, queries = self.user_queries()
+        self.assertEqual((status_code, len(queries)), (200, 0))
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.user_queries()[0], 401)
+
+    def test_프로세스마다_따로인_캐시는_배포_검사에서_경고한다(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        redis = {'default': {'BACKEND': 'django_redis.cache.RedisCache', 'LOCATION': 'redis://redis:6379/0'}}
+        with override_settings(CACHES=locmem):
+            self.assertEqual([w.id for w in check_shared_cache(None)], ['accounts.W001'])
+        with override_settings(CACHES=redis):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class RefreshTokenTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='user@test.com', username='user')
+
+    def refresh(self, token):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post('/accounts/token/refresh/', {'refresh': str(token)})
+        return res.status_code, [q for q in queries if 'token_blacklist_blacklistedtoken' in q['sql']]
+
+    def test_블랙리스트에_없는_토큰은_블랙리스트를_조회하지_않고_갱신한다(self):
+        self.refresh(RefreshToken.for_user(self.user))  # 블룸 필터를 만든다.
+        status_code, queries = self.refresh(RefreshToken.for_user(self.user))
+        self.assertEqual((status_code, queries), (200, []))
+
+    def test_블랙리스트에_넣은_토큰은_갱신할수없다(self):
+        token = AccountsRefreshToken.for_user(self.user)
+        self.assertEqual(self.refresh(token)[0], 200)
+        AccountsRefreshToken(str(token)).blacklist()
+        self.assertEqual(self.refresh(token)[0], 401)
+
+    @override_settings(TOKEN_BLACKLIST_FILTER_REFRESH_INTERVAL=0)
+    def test_늦게_커밋된_작은_id의_블랙리스트도_필터에_반영한다(self):
+        late, early = AccountsRefreshToken.for_user(self.user), AccountsRefreshToken.for_user(self.user)
+        late_outstanding = OutstandingToken.objects.get(jti=late['jti'])
+        blacklist_filter.reset()
+        # 다른 프로세스가 시퀀스에서 먼저 받은 id 로 늦게 커밋한 행을 흉내 낸다.
+        early_row = BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=early['jti']))
+        self.assertEqual(self.refresh(late)[0], 200)
+        BlacklistedToken.objects.create(id=early_row.id - 1, token=late_outstanding)
+
+        self.assertEqual(self.refresh(late)[0], 401)
+        count = blacklist_filter.bloom.count
+        self.refresh(early)
+        self.assertEqual(blacklist_filter.bloom.count, count)
+
+    def test_만료된_토큰을_나눠서_지운다(self):
+        for _ in range(3):
+            token = AccountsRefreshToken.for_user(self.user)
+            token.blacklist()
+        OutstandingToken.objects.update(expires_at=timezone.now() - timedelta(days=1))
+        AccountsRefreshToken.for_user(self.user)
+
+        call_command('purge_expired_tokens', '--batch-size', '2', '--pause', '0', stdout=io.StringIO())
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+        self.assertEqual(BlacklistedToken.objects.count(), 0)
+
+
+class SessionRoutingMiddlewareTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='user@test.com', username='user')
+
+    def test_API_요청은_세션을_읽거나_만들지_않는다(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = 'session'
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get('/accounts/notifications/unread/')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse(hasattr(res.wsgi_request, 'session'))
+        self.assertEqual([q for q in queries if 'django_session' in q['sql']], [])
+
+    def test_admin_은_세션과_인증_미들웨어를_거친다(self):
+        res = self.client.get('/admin/login/')
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(hasattr(res.wsgi_request, 'session'))
+        self.assertFalse(res.wsgi_request.user.is_authenticated)
@@ -0,0 +1,145 @@
+"""
+블랙리스트 확인 앞에 블룸 필터를 둔 RefreshToken.
+
+토큰을 갱신하거나 로그아웃할 때마다 BlacklistedToken 을 조회하지 않고, 프로세스 안의 블룸 필터에 jti 가 있을 때만 조회한다.
+블룸 필터는 거짓 양성은 있어도 거짓 음성은 없으므로 필터에 없으면 블랙리스트에 없는 토큰이다.
+
+이 프로세스에서 블랙리스트에 넣은 토큰은 바로 필터에 들어간다. 다른 프로세스에서 넣은 토큰은
+TOKEN_BLACKLIST_FILTER_REFRESH_INTERVAL 초마다 읽어 더한다. 시퀀스 값은 커밋 순서와 다를 수 있어서 마지막으로 읽은 id 보다
+작은 id 가 나중에 커밋될 수 있다. 그래서 id 가 더 큰 행과 함께 지난번 갱신 시각에서 TOKEN_BLACKLIST_FILTER_OVERLAP 초
+전부터 블랙리스트에 들어간 행을 다시 읽는다. blacklisted_at 뒤로 그보다 오래 커밋되지 않은 행은 REBUILD_INTERVAL 마다 하는
+전체 재구성에서 들어간다.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+
+REBUILD_INTERVAL = 60 * 60
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(capacity, 1000)
+        self.size = int(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hash_count = max(int(self.size / self.capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        a, b = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big')
+        return [(a + i * b) % self.size for i in range(self.hash_count)]
+
+    def add(self, value):
+        for position in self.positions(value):
+            self.bits[position // 8] |= 1 << (position % 8)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position // 8] & (1 << (position % 8)) for position in self.positions(value))
+
+
+class BlacklistFilter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bloom = None
+        self.last_id = 0
+        self.refreshed_at = 0
+        self.built_at = 0
+        # 마지막으로 읽기 시작한 시각(DB 에 저장된 blacklisted_at 과 비교하므로 timezone.now())
+        self.read_since = None
+        # 다시 읽는 구간 안에서 이미 필터에 넣은 행. 같은 행을 다시 세지 않도록 한다. {id: blacklisted_at}
+        self.recent = {}
+
+    def might_contain(self, jti):
+        self.refresh()
+        return jti in self.bloom
+
+    def add(self, jti):
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+
+    def reset(self):
+        with self.lock:
+            self.bloom = None
+
+    def refresh(self):
+        now = time.monotonic()
+        if self.bloom is not None and now - self.refreshed_at < settings.TOKEN_BLACKLIST_FILTER_REFRESH_INTERVAL:
+            return
+
+        with self.lock:
+            if self.bloom is None or now - self.built_at > REBUILD_INTERVAL:
+                self.rebuild(now)
+            elif now - self.refreshed_at >= settings.TOKEN_BLACKLIST_FILTER_REFRESH_INTERVAL:
+                self.catch_up(now)
+
+    def rebuild(self, now):
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+        read_since = timezone.now()
+        # 만료된 토큰은 서명 검증에서 걸러지므로 필터에 넣지 않는다.
+        rows = list(BlacklistedToken.objects.filter(token__expires_at__gt=read_since)
+                    .values_list('id', 'token__jti', 'blacklisted_at'))
+        bloom = BloomFilter(len(rows) * 2)
+        for _, jti, _ in rows:
+            bloom.add(jti)
+
+        self.bloom = bloom
+        self.last_id = max([row_id for row_id, _, _ in rows], default=self.last_id)
+        self.read_since = read_since
+        self.recent = {}
+        self.remember_recent(rows)
+        self.refreshed_at = self.built_at = now
+
+    def catch_up(self, now):
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+        read_since = timezone.now()
+        new_or_recent = Q(id__gt=self.last_id) | Q(blacklisted_at__gte=self.overlap_start())
+        rows = list(BlacklistedToken.objects.filter(new_or_recent).order_by('id')
+                    .values_list('id', 'token__jti', 'blacklisted_at'))
+        rows = [row for row in rows if row[0] not in self.recent]
+        if self.bloom.count + len(rows) > self.bloom.capacity:
+            self.rebuild(now)
+            return
+
+        for row_id, jti, _ in rows:
+            self.bloom.add(jti)
+        self.last_id = max([row_id for row_id, _, _ in rows], default=self.last_id)
+        self.read_since = read_since
+        self.remember_recent(rows)
+        self.refreshed_at = now
+
+    def overlap_start(self):
+        return self.read_since - timedelta(seconds=settings.TOKEN_BLACKLIST_FILTER_OVERLAP)
+
+    def remember_recent(self, rows):
+        overlap_start = self.overlap_start()
+        self.recent.update((row_id, blacklisted_at) for row_id, _, blacklisted_at in rows
+                           if blacklisted_at >= overlap_start)
+        self.recent = {row_id: blacklisted_at for row_id, blacklisted_at in self.recent.items()
+                       if blacklisted_at >= overlap_start}
+
+
+blacklist_filter = BlacklistFilter()
+
+
+class RefreshToken(BaseRefreshToken):
+    def check_blacklist(self):
+        if blacklist_filter.might_contain(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+    def blacklist(self):
+        result = super().blacklist()
+        blacklist_filter.add(self.payload[api_settings.JTI_CLAIM])
+        return result
@@ -1,7 +1,7 @@
 from django.urls import path
 
 from accounts.views import get_unread_notifications, mark_as_read, mark_all_as_read, search_user_by_email, ProfileView, \
-    UnreadNotificiationAPIView, MarkAsReadAPIView, MarkAllAsReadAPIView, SearchUserByEmailAPIView
+    UnreadNotificiationAPIView, MarkAsReadAPIView, MarkAllAsReadAPIView, SearchUserByEmailAPIView, RefreshView
 
 urlpatterns = [
     path('notifications/unread/', UnreadNotificiationAPIView.as_view()),
@@ -9,4 +9,5 @@ urlpatterns = [
     path('notifications/mark_all_as_read/', MarkAllAsReadAPIView.as_view()),
     path('search/', SearchUserByEmailAPIView.as_view()),
     path('profile/', ProfileView.as_view()),
+    path('token/refresh/', RefreshView.as_view(), name='token_refresh'),  # dj_rest_auth.urls 의 token/refresh/ 대신 사용
 ]
@@ -7,8 +7,9 @@ from django.utils.translation import gettext_lazy as _
 import requests
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Case, Exists, IntegerField, OuterRef, Value, When
 
-from dj_rest_auth.jwt_auth import unset_jwt_cookies
+from dj_rest_auth.jwt_auth import unset_jwt_cookies, get_refresh_view
 
 from django.http.response import JsonResponse
 from dj_rest_auth.registration.views import SocialLoginView
@@ -26,10 +27,12 @@ from rest_framework.response import Response
 from dj_rest_auth.views import LogoutView as dj_rest_auth_LogoutView
 from rest_framework.views import APIView
 from rest_framework_simplejwt.exceptions import TokenError
-from rest_framework_simplejwt.tokens import RefreshToken
-from accounts.models import User
+from accounts.models import User, get_notification_state, get_unread_notification_queryset, \
+    mark_notification_as_read, mark_all_notifications_as_read
 from accounts.permissions import IsOwnerOnly
-from accounts.serializers import NotificationSerializer, UserSearchResultSerializer, ProfileSerializer
+from accounts.serializers import NotificationSerializer, UserSearchResultSerializer, ProfileSerializer, \
+    RefreshTokenSerializer, get_notification_serializer_context
+from accounts.tokens import RefreshToken
 from issue.models import Team, Project, Participation
 from smallissue.settings.base import DEFAULT_PERMISSION_CLASSES
 
@@ -142,6 +145,10 @@ class LogoutView(dj_rest_auth_LogoutView):
         return response
 
 
+class RefreshView(get_refresh_view()):
+    serializer_class = RefreshTokenSerializer
+
+
 NOTIFICATION_MAX = 10
 
 
@@ -150,22 +157,20 @@ class UnreadNotificiationAPIView(DjangoGroupCompatibleAPIView):
         if not request.user.is_authenticated:
             return Response(status=401)
 
-        unread_list = request.user.notifications.unread()[0:NOTIFICATION_MAX]
+        state = get_notification_state(request.user.id)
+        unread_list = list(get_unread_notification_queryset(request.user.id, state.read_until_id)[0:NOTIFICATION_MAX])
+        context = get_notification_serializer_context(unread_list)
 
         return Response({
-            "unread_count": len(unread_list),
-            "unread_list": NotificationSerializer(unread_list, many=True).data
+            "unread_count": state.unread_count,
+            "unread_list": NotificationSerializer(unread_list, many=True, context=context).data
         }, status=200)
 
 
 class MarkAsReadAPIView(DjangoGroupCompatibleAPIView):
     def patch(self, request, pk=None):
         try:
-            notification = Notification.objects.get(
-                id=pk,
-                recipient=request.user,
-            )
-            notification.mark_as_read()
+            mark_notification_as_read(request.user.id, pk)
             return Response(status=200)
         except Notification.DoesNotExist:
             return Response({'error': '알람이 존재하지 않습니다'}, status=404)
@@ -176,11 +181,13 @@ def get_unread_notifications(request: Request):
     if not request.user.is_authenticated:
         return Response(status=401)
 
-    unread_list = request.user.notifications.unread()[0:NOTIFICATION_MAX]
+    state = get_notification_state(request.user.id)
+    unread_list = list(get_unread_notification_queryset(request.user.id, state.read_until_id)[0:NOTIFICATION_MAX])
+    context = get_notification_serializer_context(unread_list)
 
     return Response({
-        "unread_count": len(unread_list),
-        "unread_list": NotificationSerializer(unread_list, many=True).data
+        "unread_count": state.unread_count,
+        "unread_list": NotificationSerializer(unread_list, many=True, context=context).data
     }, status=200)
 
 
@@ -190,11 +197,7 @@ def mark_as_read(request, pk=None):
         return Response(status=401)
 
     try:
-        notification = Notification.objects.get(
-            id=pk,
-            recipient=request.user,
-        )
-        notification.mark_as_read()
+        mark_notification_as_read(request.user.id, pk)
         return Response(status=200)
     except Notification.DoesNotExist:
         return Response({'error': '알람이 존재하지 않습니다'}, status=404)
@@ -205,7 +208,7 @@ class MarkAllAsReadAPIView(DjangoGroupCompatibleAPIView):
         if not request.user.is_authenticated:
             return Response(status=401)
 
-        request.user.notifications.mark_all_as_read()
+        mark_all_notifications_as_read(request.user.id)
         return Response(status=200)
 
 
@@ -214,33 +217,67 @@ def mark_all_as_read(request):
     if not request.user.is_authenticated:
         return Response(status=401)
 
-    request.user.notifications.mark_all_as_read()
+    mark_all_notifications_as_read(request.user.id)
     return Response(status=200)
 
 
+USER_SEARCH_LIMIT = 20
+# 이보다 짧은 검색어는 trigram 인덱스를 쓸 수 없으므로 앞부분 일치로만 찾는다.
+USER_SEARCH_MIN_CONTAINS_LENGTH = 3
+
+
+def get_user_search_queryset(query_params):
+    """
+    이메일로 사용자를 찾는다. 일치, 앞부분 일치, 부분 일치 순으로 USER_SEARCH_LIMIT 명까지 돌려준다.
+    프로젝트와 팀 조건은 JOIN 대신 EXISTS 로 건다.
+    """
+    email = (query_params.get('email') or '').strip()
+    project_id = query_params.get('project')
+    filter = query_params.get('filter')
+    team = query_params.get('team')
+
+    if filter not in ('include', 'exclude'):
+        raise ValueError('filter는 include, exclude 둘 중 하나여야 합니다.')
+    if not email:
+        return User.objects.none()
+
+    if len(email) < USER_SEARCH_MIN_CONTAINS_LENGTH:
+        qs = User.objects.filter(email__istartswith=email)
+    else:
+        qs = User.objects.filter(email__icontains=email)
+
+    participation = Participation.objects.filter(project_id=project_id, user_id=OuterRef('pk'))
+    qs = qs.filter(Exists(participation) if filter == 'include' else ~Exists(participation))
+
+    if team:
+        try:
+            team_id = int(team[1:])
+        except ValueError:
+            raise ValueError('team은 +팀id, -팀id 형식이어야 합니다.')
+        membership = Team.users.through.objects.filter(team_id=team_id, user_id=OuterRef('pk'))
+        if team[0] == '+':
+            qs = qs.filter(Exists(membership))
+        elif team[0] == '-':
+            qs = qs.filter(~Exists(membership))
+
+    rank = Case(
+        When(email__iexact=email, then=Value(0)),
+        When(email__istartswith=email, then=Value(1)),
+        default=Value(2),
+        output_field=IntegerField(),
+    )
+    return qs.only('id', 'username', 'email').annotate(rank=rank).order_by('rank', 'email')[:USER_SEARCH_LIMIT]
+
+
 class SearchUserByEmailAPIView(DjangoGroupCompatibleAPIView):
     def get(self, request):
         if not request.user.is_authenticated:
             return Response(status=401)
 
-        email = request.query_params.get('email')
-        project_id = request.query_params.get('project')
-        filter = request.query_params.get('filter')
-        team = request.query_params.get('team')
-
-        if filter == 'include':
-            qs = User.objects.filter(email__contains=email, projects__id=project_id)
-        elif filter == 'exclude':
-            qs = User.objects.filter(email__contains=email).exclude(projects__id=project_id)
-        else:
-            return Response({'error': 'filter는 include, exclude 둘 중 하나여야 합니다.'}, status=400)
-
-        if team:
-            team_filter = team[0]
-            if team_filter == '+':
-                qs = qs.filter(project_teams__id=int(team[1:]))
-            elif team_filter == '-':
-                qs = qs.exclude(project_teams__id=int(team[1:]))
+        try:
+            qs = get_user_search_queryset(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
 
         return Response(UserSearchResultSerializer(qs, many=True).data, status=200)
 
@@ -250,24 +287,10 @@ def search_user_by_email(request: Request):
     if not request.user.is_authenticated:
         return Response(status=401)
 
-    email = request.query_params.get('email')
-    project_id = request.query_params.get('project')
-    filter = request.query_params.get('filter')
-    team = request.query_params.get('team')
-
-    if filter == 'include':
-        qs = User.objects.filter(email__contains=email, projects__id=project_id)
-    elif filter == 'exclude':
-        qs = User.objects.filter(email__contains=email).exclude(projects__id=project_id)
-    else:
-        return Response({'error': 'filter는 include, exclude 둘 중 하나여야 합니다.'}, status=400)
-
-    if team:
-        team_filter = team[0]
-        if team_filter == '+':
-            qs = qs.filter(project_teams__id=int(team[1:]))
-        elif team_filter == '-':
-            qs = qs.exclude(project_teams__id=int(team[1:]))
+    try:
+        qs = get_user_search_queryset(request.query_params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
 
     return Response(UserSearchResultSerializer(qs, many=True).data, status=200)
 
@@ -0,0 +1,93 @@
+import time
+from datetime import timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from issue.models import Project, Participation, Team, Attachment, Issue, IssueSubscription, IssueTagging, \
+    IssueHistory, IssueChange, IssueEventOutbox, IssueSearchDocument, Comment, ArchivedRecord
+
+
+class Command(BaseCommand):
+    help = '지운 지 --days 일이 지난 프로젝트, 이슈, 댓글과 그 이력을 ArchivedRecord 로 옮기고 원래 테이블에서 지웁니다. ' \
+           '한 트랜잭션에서 batch-size 개씩 옮깁니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help='지운 지 이 일수가 지난 행을 옮깁니다.')
+        parser.add_argument('--batch-size', type=int, default=500, help='한 트랜잭션에서 옮길 행 수')
+        parser.add_argument('--pause', type=float, default=0.1, help='배치 사이에 쉴 시간(초)')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        self.batch_size, self.pause = options['batch_size'], options['pause']
+
+        comments = self.run(Comment.all_objects.filter(deleted_at__lt=cutoff), archive_comments)
+        issues = self.run(Issue.all_objects.filter(deleted_at__lt=cutoff), archive_issues)
+        # 옮길 프로젝트의 이슈는 지웠는지와 상관없이 먼저 옮긴다.
+        issues += self.run(Issue.all_objects.filter(project__deleted_at__lt=cutoff), archive_issues)
+        projects = self.run(Project.all_objects.filter(deleted_at__lt=cutoff), archive_projects)
+        self.stdout.write('프로젝트 {}개, 이슈 {}개, 댓글 {}개를 옮겼습니다.'.format(projects, issues, comments))
+
+    def run(self, queryset, archive):
+        archived = 0
+        while True:
+            with transaction.atomic():
+                ids = list(queryset.order_by('id').values_list('id', flat=True)[:self.batch_size])
+                if not ids:
+                    break
+                archive(ids)
+
+            archived += len(ids)
+            time.sleep(self.pause)
+        return archived
+
+
+def archive(*querysets):
+    records = []
+    for queryset in querysets:
+        opts = queryset.model._meta
+        content_type = ContentType.objects.get_for_model(queryset.model)
+        records += [ArchivedRecord(content_type=content_type, object_id=row[opts.pk.attname], data=row)
+                    for row in queryset.values(*[field.attname for field in opts.concrete_fields])]
+    ArchivedRecord.objects.bulk_create(records, batch_size=1000)
+
+
+def delete(*querysets):
+    # 시그널 없이 지운다. Issue, IssueTagging 을 Collector 로 지우면 simple_history 가 삭제 이력을 새로 남기고,
+    # 그 이력이 다시 IssueHistory 와 알림을 만든다.
+    for queryset in querysets:
+        queryset._raw_delete(queryset.db)
+
+
+def archive_comments(comment_ids):
+    comments = Comment.all_objects.filter(id__in=comment_ids)
+    archive(comments)
+    delete(comments)
+
+
+def archive_issues(issue_ids):
+    issues = Issue.all_objects.filter(id__in=issue_ids)
+    comments = Comment.all_objects.filter(issue_id__in=issue_ids)
+    issue_records = Issue.history.model.objects.filter(id__in=issue_ids)
+    tagging_records = IssueTagging.history.model.objects.filter(issue_id__in=issue_ids)
+    issue_histories = IssueHistory.objects.filter(issue_id__in=issue_ids)
+    issue_changes = IssueChange.objects.filter(issue_id__in=issue_ids)
+
+    archive(issues, comments, issue_records, tagging_records, issue_histories, issue_changes)
+    delete(IssueEventOutbox.objects.filter(issue_history__issue_id__in=issue_ids), issue_changes, issue_histories,
+           tagging_records, issue_records, IssueTagging.objects.filter(issue_id__in=issue_ids),
+           IssueSubscription.objects.filter(issue_id__in=issue_ids),
+           IssueSearchDocument.objects.filter(issue_id__in=issue_ids), comments, issues)
+
+
+def archive_projects(project_ids):
+    projects = Project.all_objects.filter(id__in=project_ids)
+    participations = Participation.objects.filter(project_id__in=project_ids)
+    teams = Team.objects.filter(project_id__in=project_ids)
+    attachments = Attachment.objects.filter(project_id__in=project_ids)
+
+    archive(projects, participations, teams, attachments)
+    delete(Team.users.through.objects.filter(team__project_id__in=project_ids), teams, participations, attachments,
+           projects)
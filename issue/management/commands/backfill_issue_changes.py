@@ -0,0 +1,89 @@
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from issue.models import Issue, IssueTagging, IssueHistory, IssueChange, get_history_changes, build_issue_changes
+
+
+class Command(BaseCommand):
+    help = '기존 HistoricalIssue, HistoricalIssueTagging 기록으로 IssueChange 테이블을 채웁니다. 여러 번 실행해도 안전합니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='한 번에 처리할 이슈 수')
+
+    def handle(self, *args, **options):
+        HistoricalIssue = Issue.history.model
+        self.content_types = {
+            HistoricalIssue: ContentType.objects.get_for_model(HistoricalIssue),
+            IssueTagging.history.model: ContentType.objects.get_for_model(IssueTagging.history.model),
+        }
+
+        last_issue_id = 0
+        total = 0
+        while True:
+            issue_ids = list(HistoricalIssue.objects.filter(id__gt=last_issue_id).order_by('id')
+                             .values_list('id', flat=True).distinct()[:options['batch_size']])
+            if not issue_ids:
+                break
+
+            with transaction.atomic():
+                total += self.backfill(issue_ids)
+            last_issue_id = issue_ids[-1]
+            self.stdout.write('이슈 #{}까지 처리했습니다.'.format(last_issue_id))
+
+        self.stdout.write('변경 이력 {}건을 만들었습니다.'.format(total))
+
+    def backfill(self, issue_ids):
+        histories = []  # (history, prev_record)
+        prev_records = {}
+        issue_records = Issue.history.model.objects.filter(id__in=issue_ids).select_related('history_user') \
+            .order_by('id', 'history_date', 'history_id')
+        for record in issue_records:
+            histories.append((record, prev_records.get(record.id)))
+            prev_records[record.id] = record
+
+        tagging_records = IssueTagging.history.model.objects.filter(issue_id__in=issue_ids) \
+            .select_related('history_user', 'tag')
+        histories += [(record, None) for record in tagging_records]
+
+        issue_histories = self.get_issue_histories(issue_ids, histories)
+        done = set(IssueChange.objects.filter(issue_id__in=issue_ids).values_list('issue_history_id', flat=True))
+
+        assignee_ids = set()
+        for record, _ in histories:
+            if isinstance(record, Issue.history.model) and record.assignee_id is not None:
+                assignee_ids.add(record.assignee_id)
+        usernames = dict(get_user_model().objects.filter(id__in=assignee_ids).values_list('id', 'username'))
+
+        changes = []
+        for record, prev_record in histories:
+            issue_history = issue_histories[self.content_types[record.__class__].id, record.history_id]
+            if issue_history.id in done:
+                continue
+            changes += build_issue_changes(issue_history, get_history_changes(record, prev_record, usernames))
+
+        IssueChange.objects.bulk_create(changes, batch_size=1000)
+        return len(changes)
+
+    def get_issue_histories(self, issue_ids, histories):
+        # 예전 기록 중에는 IssueHistory 행이 없는 것도 있어서 함께 만들어 준다.
+        def load():
+            return {(h.content_type_id, h.history_id): h for h in IssueHistory.objects.filter(issue_id__in=issue_ids)}
+
+        issue_histories = load()
+        missing = []
+        for record, _ in histories:
+            content_type = self.content_types[record.__class__]
+            if (content_type.id, record.history_id) not in issue_histories:
+                missing.append(IssueHistory(
+                    content_type=content_type,
+                    history_id=record.history_id,
+                    issue_id=record.id if isinstance(record, Issue.history.model) else record.issue_id,
+                    history_date=record.history_date,
+                ))
+
+        if missing:
+            IssueHistory.objects.bulk_create(missing, batch_size=1000)
+            issue_histories = load()
+        return issue_histories
@@ -0,0 +1,61 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from notifications.signals import notify
+
+from issue.models import Project, Issue, IssueHistory
+from issue.notifications import bulk_notify
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'notify.send 와 bulk_notify 로 구독자 알림을 만드는 시간을 비교합니다. 만든 데이터는 모두 롤백합니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, nargs='+', default=[10, 100, 1000], help='구독자 수')
+        parser.add_argument('--repeat', type=int, default=3, help='구독자 수마다 반복할 횟수, 가장 빠른 값을 사용합니다.')
+
+    def handle(self, *args, **options):
+        self.stdout.write('{:>12} {:>22} {:>22}'.format('subscribers', 'notify.send', 'bulk_notify'))
+        for count in options['subscribers']:
+            with transaction.atomic():
+                actor, recipients, target = self.setup(count)
+                send = self.measure(options['repeat'], lambda: notify.send(
+                    actor, recipient=recipients, verb='업데이트', description='이슈를 업데이트했습니다.', target=target))
+                bulk = self.measure(options['repeat'], lambda: bulk_notify(
+                    actor, [user.id for user in recipients], '업데이트', target, '이슈를 업데이트했습니다.'))
+                transaction.set_rollback(True)
+
+            self.stdout.write('{:>12} {:>22} {:>22}'.format(count, self.format(*send), self.format(*bulk)))
+
+    @staticmethod
+    def setup(count):
+        actor = User.objects.create(username='benchmark_actor', email='benchmark_actor@example.com')
+        emails = ['benchmark_{}@example.com'.format(i) for i in range(count)]
+        User.objects.bulk_create([User(username='benchmark_{}'.format(i), email=email) for i, email in enumerate(emails)])
+        # bulk_create 는 DB 에 따라(SQLite 등) pk 를 채우지 않으므로 다시 읽는다.
+        recipients = list(User.objects.filter(email__in=emails).order_by('id'))
+        project = Project.objects.create(name='benchmark', key='BM', leader=actor)
+        issue = Issue(title='benchmark', project=project, author=actor)
+        issue._history_user = actor
+        issue.save()
+        return actor, recipients, IssueHistory.objects.filter(issue_id=issue.id).first()
+
+    @staticmethod
+    def measure(repeat, func):
+        best = None
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                func()
+                elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, len(queries)
+
+    @staticmethod
+    def format(elapsed, queries):
+        return '{:.1f}ms / {} queries'.format(elapsed * 1000, queries)
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from issue.models import Project, Issue, rebalance_issue_orders
+
+
+class Command(BaseCommand):
+    help = '이슈 순서 값 사이의 간격이 좁아진 프로젝트의 이슈 순서를 다시 매깁니다. 주기적으로 실행하세요.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-gap', type=int, default=16,
+                            help='이웃한 이슈의 순서 값 차이가 이 값보다 작으면 다시 매깁니다.')
+        parser.add_argument('--project', type=int, action='append', dest='project_ids',
+                            help='지정한 프로젝트만 검사합니다. 여러 번 지정할 수 있습니다.')
+
+    def handle(self, *args, **options):
+        projects = Project.objects.all()
+        if options['project_ids']:
+            projects = projects.filter(id__in=options['project_ids'])
+
+        rebalanced = 0
+        for project_id in projects.values_list('id', flat=True).iterator():
+            if self.needs_rebalance(project_id, options['min_gap']):
+                rebalance_issue_orders(project_id)
+                rebalanced += 1
+
+        self.stdout.write('{}개 프로젝트의 이슈 순서를 다시 매겼습니다.'.format(rebalanced))
+
+    @staticmethod
+    def needs_rebalance(project_id, min_gap):
+        orders = Issue.objects.filter(project_id=project_id).order_by('order') \
+            .values_list('order', flat=True)
+
+        prev_order = None
+        for order in orders.iterator():
+            if order is None:
+                return True
+            if prev_order is not None and order - prev_order < min_gap:
+                return True
+            prev_order = order
+        return False
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from issue.notifications import process_issue_events
+
+
+class Command(BaseCommand):
+    help = 'IssueEventOutbox 를 비우면서 이슈 변경 알림을 만드는 워커입니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='한 번에 처리할 이벤트 수')
+        parser.add_argument('--interval', type=float, default=1.0, help='처리할 이벤트가 없을 때 기다릴 시간(초)')
+        parser.add_argument('--once', action='store_true', help='쌓인 이벤트를 모두 처리하면 종료합니다.')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_issue_events(options['batch_size'])
+            if processed:
+                self.stdout.write('이벤트 {}개를 처리했습니다.'.format(processed))
+                continue
+
+            if options['once']:
+                break
+            close_old_connections()
+            time.sleep(options['interval'])
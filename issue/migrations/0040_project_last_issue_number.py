@@ -0,0 +1,34 @@
+# Generated by Django 3.2.25 on 2026-10-18 06:28
+
+from django.db import migrations, models
+
+
+def set_last_issue_number(apps, schema_editor):
+    Project = apps.get_model('issue', 'Project')
+    Issue = apps.get_model('issue', 'Issue')
+
+    for project in Project.objects.all():
+        numbers = [0]
+        for key in Issue.objects.filter(project=project).exclude(key=None).values_list('key', flat=True):
+            suffix = key.rsplit('-', 1)[-1]
+            if suffix.isdigit():
+                numbers.append(int(suffix))
+
+        project.last_issue_number = max(max(numbers), Issue.objects.filter(project=project).count())
+        project.save(update_fields=['last_issue_number'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issue', '0039_auto_20211013_2002'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='last_issue_number',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(set_last_issue_number, migrations.RunPython.noop),
+    ]
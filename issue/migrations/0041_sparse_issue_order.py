@@ -0,0 +1,39 @@
+# Generated by Django 3.2.25 on 2026-10-18 06:29
+
+from django.db import migrations, models
+from django.db.models import F
+
+ISSUE_ORDER_STEP = 2 ** 16
+
+
+def spread_issue_orders(apps, schema_editor):
+    Issue = apps.get_model('issue', 'Issue')
+    Project = apps.get_model('issue', 'Project')
+
+    for project_id in Project.objects.values_list('id', flat=True):
+        issues = list(Issue.objects.filter(project_id=project_id)
+                      .order_by(F('order').asc(nulls_last=True), 'id').only('id', 'order'))
+        for i, issue in enumerate(issues):
+            issue.order = (i + 1) * ISSUE_ORDER_STEP
+        Issue.objects.bulk_update(issues, ['order'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issue', '0040_project_last_issue_number'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historicalissue',
+            name='order',
+            field=models.PositiveBigIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='issue',
+            name='order',
+            field=models.PositiveBigIntegerField(null=True),
+        ),
+        migrations.RunPython(spread_issue_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.25 on 2026-10-18 06:31
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issue', '0041_sparse_issue_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IssueChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('issue_id', models.PositiveIntegerField()),
+                ('field', models.CharField(max_length=64, null=True)),
+                ('old_value', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('new_value', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('type', models.CharField(max_length=1)),
+                ('actor_id', models.PositiveIntegerField(null=True)),
+                ('actor_username', models.CharField(max_length=40, null=True)),
+                ('date', models.DateTimeField()),
+                ('issue_history', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='issue.issuehistory')),
+            ],
+            options={
+                'ordering': ['-date', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='issuechange',
+            index=models.Index(fields=['issue_id', '-date', 'id'], name='issue_change_issue_date_idx'),
+        ),
+    ]
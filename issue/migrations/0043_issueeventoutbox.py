@@ -0,0 +1,22 @@
+# Generated by Django 3.2.25 on 2026-10-18 06:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issue', '0042_issuechange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IssueEventOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('issue_history', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='issue.issuehistory')),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-18 06:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issue', '0044_alive_indexes_archivedrecord'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attachment',
+            index=models.Index(fields=['project', '-uploaded_at'], name='attachment_project_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attachment',
+            index=models.Index(fields=['project', 'content_type', 'content_id', '-uploaded_at'], name='attachment_content_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issuehistory',
+            index=models.Index(fields=['issue_id', '-history_date'], name='issue_history_issue_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='participation',
+            index=models.Index(fields=['project', '-date_joined'], name='participation_project_date_idx'),
+        ),
+    ]
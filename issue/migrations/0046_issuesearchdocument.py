@@ -0,0 +1,53 @@
+# Generated by Django 3.2.25 on 2026-10-18 06:57
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# GIN 인덱스는 Postgres 에서만 만들고, 기존 이슈의 검색 벡터를 한 번에 채운다.
+# 채우는 SQL 은 이 마이그레이션을 만들 때의 issue.models.update_issue_search_documents 와 같다. 모델 코드가 바뀌어도
+# 마이그레이션은 그대로 돌아가도록 옮겨 적는다.
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('CREATE INDEX IF NOT EXISTS issue_search_vector_idx '
+                          'ON issue_issuesearchdocument USING gin (vector)')
+    schema_editor.execute('''
+        INSERT INTO issue_issuesearchdocument (issue_id, vector)
+        SELECT i.id,
+               setweight(to_tsvector('simple', coalesce(i.title, '')), 'A') ||
+               setweight(to_tsvector('simple', coalesce(i.body, '')), 'B') ||
+               setweight(to_tsvector('simple', coalesce((
+                   SELECT string_agg(c.content, ' ') FROM issue_comment c
+                   WHERE c.issue_id = i.id AND c.deleted_at IS NULL
+               ), '')), 'C')
+        FROM issue_issue i
+        ON CONFLICT (issue_id) DO UPDATE SET vector = EXCLUDED.vector
+    ''')
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('DROP INDEX IF EXISTS issue_search_vector_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issue', '0045_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IssueSearchDocument',
+            fields=[
+                ('issue', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='issue.issue')),
+                ('vector', django.contrib.postgres.search.SearchVectorField()),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.2.25 on 2026-10-18 06:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issue', '0046_issuesearchdocument'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tag',
+            name='name',
+            field=models.CharField(db_index=True, max_length=30),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(condition=models.Q(('deleted_at', None)), fields=['project', 'status', 'order', 'id'], name='issue_alive_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(condition=models.Q(('deleted_at', None)), fields=['project', 'assignee', 'order', 'id'], name='issue_alive_assignee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(condition=models.Q(('deleted_at', None)), fields=['project', '-updated_at', 'id'], name='issue_alive_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(condition=models.Q(('deleted_at', None)), fields=['project', '-created_at', 'id'], name='issue_alive_created_idx'),
+        ),
+    ]
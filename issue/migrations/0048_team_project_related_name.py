@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('issue', '0047_issue_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='team',
+            name='project',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='teams', to='issue.project'),
+        ),
+    ]
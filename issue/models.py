@@ -1,16 +1,18 @@
 from django.contrib.auth import get_user_model
-from django.contrib.auth.models import Group
-from notifications.signals import notify
 
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
-from django.db.models.signals import post_save
-from simple_history.models import HistoricalRecords
-
+from django.core.serializers.json import DjangoJSONEncoder
+from django.contrib.postgres.search import SearchVectorField
+from django.db import connection, models, transaction
+from django.db.models import F, Max, OuterRef, Q, Subquery
+from django.db.models.signals import post_save, pre_save
+from simple_history.models import HistoricalRecords, ModelChange
+
+from accounts.groups import get_group, PROJECT_LEADER
 from smallissue.models import BaseModel
-from smallissue.utils import get_or_none_if_pk_is_none
+from smallissue.utils import get_or_none_if_pk_is_none, prefetch_generic_foreign_key
 
 
 class Project(BaseModel):
@@ -19,6 +21,13 @@ class Project(BaseModel):
     leader = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, related_name='projects_leading')
     users = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='projects', through='Participation')
     order = models.PositiveSmallIntegerField(null=True)
+    last_issue_number = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # 지운 프로젝트는 인덱스에 넣지 않는다.
+        indexes = [
+            models.Index(fields=['order', 'id'], condition=Q(deleted_at=None), name='project_alive_order_idx'),
+        ]
 
     def __str__(self):
         return '{}#{}'.format(self.name, self.id)
@@ -26,8 +35,7 @@ class Project(BaseModel):
 
 def add_project_leader_to_leader_group(sender, instance: Project, created, **kwargs):
     if created:
-        group = Group.objects.get(name='project_leader')
-        instance.leader.groups.add(group)
+        instance.leader.groups.add(get_group(PROJECT_LEADER))
 
 
 post_save.connect(add_project_leader_to_leader_group, sender=Project)
@@ -39,6 +47,11 @@ class Participation(models.Model):
     job_title = models.CharField(max_length=80, null=True, blank=True)
     date_joined = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['project', '-date_joined'], name='participation_project_date_idx'),
+        ]
+
     def __str__(self):
         return '{} - {}'.format(self.project, self.user.username)
 
@@ -69,20 +82,94 @@ class Issue(BaseModel):
                                          through='IssueSubscription', blank=True)
     status = models.SmallIntegerField(choices=STATUS.choices, default=STATUS.TODO)
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='issues')
-    order = models.PositiveSmallIntegerField(null=True)
+    order = models.PositiveBigIntegerField(null=True)
     tags = models.ManyToManyField('issue.Tag', related_name='issues', through='IssueTagging',
                                   through_fields=('issue', 'tag'))
     history = HistoricalRecords()
 
+    class Meta:
+        # 프로젝트 이슈 목록은 지우지 않은 이슈만 읽으므로 지운 이슈는 인덱스에 넣지 않는다.
+        # 상태, 담당자 필터와 ISSUE_SORTS 의 정렬마다 프로젝트로 시작하는 인덱스를 둔다.
+        indexes = [
+            models.Index(fields=['project', 'order', 'id'], condition=Q(deleted_at=None),
+                         name='issue_alive_order_idx'),
+            models.Index(fields=['project', 'status', 'order', 'id'], condition=Q(deleted_at=None),
+                         name='issue_alive_status_idx'),
+            models.Index(fields=['project', 'assignee', 'order', 'id'], condition=Q(deleted_at=None),
+                         name='issue_alive_assignee_idx'),
+            models.Index(fields=['project', '-updated_at', 'id'], condition=Q(deleted_at=None),
+                         name='issue_alive_updated_idx'),
+            models.Index(fields=['project', '-created_at', 'id'], condition=Q(deleted_at=None),
+                         name='issue_alive_created_idx'),
+        ]
+
     def __str__(self):
         return '#{}: {}'.format(self.id, self.title)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Issue, cls).from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
-def generate_key(sender, instance, created, **kwargs):
-    if created:
-        key_num = Issue.objects.filter(project=instance.project).count()
-        instance.key = instance.project.key + '-' + str(key_num)
-        instance.save()
+    def get_changed_fields(self, update_fields=None):
+        if update_fields is not None:
+            return set(update_fields)
+
+        loaded_values = getattr(self, '_loaded_values', None)
+        if loaded_values is None:
+            return None
+
+        return {field.name for field in self._meta.concrete_fields
+                if field.attname in loaded_values and getattr(self, field.attname) != loaded_values[field.attname]}
+
+
+# 이슈 순서는 ISSUE_ORDER_STEP 간격으로 띄엄띄엄 매겨서, 이슈 하나를 옮길 때 두 이슈 사이의 중간값만 쓰면 되게 한다.
+ISSUE_ORDER_STEP = 2 ** 16
+
+
+def get_order_between(prev_order, next_order):
+    if prev_order is None and next_order is None:
+        return ISSUE_ORDER_STEP
+    elif prev_order is None:
+        new_order = next_order - ISSUE_ORDER_STEP if next_order > ISSUE_ORDER_STEP else next_order // 2
+    elif next_order is None:
+        return prev_order + ISSUE_ORDER_STEP
+    else:
+        new_order = (prev_order + next_order) // 2
+
+    # 사이에 남은 값이 없으면 None. 프로젝트의 이슈 순서를 다시 매긴 뒤 계산해야 한다.
+    if new_order == prev_order or new_order == next_order or new_order < 0:
+        return None
+    return new_order
+
+
+def get_next_issue_order(project_id):
+    last_order = Issue.objects.filter(project_id=project_id).aggregate(last_order=Max('order'))['last_order']
+    return get_order_between(last_order, None)
+
+
+def rebalance_issue_orders(project_id):
+    with transaction.atomic():
+        issues = list(Issue.objects.select_for_update().filter(project_id=project_id)
+                      .order_by(F('order').asc(nulls_last=True), 'id').only('id', 'order'))
+
+        for i, issue in enumerate(issues):
+            issue.order = (i + 1) * ISSUE_ORDER_STEP
+        Issue.objects.bulk_update(issues, ['order'], batch_size=1000)
+
+
+def next_issue_number(project_id):
+    # UPDATE 가 프로젝트 행에 잠금을 걸기 때문에 트랜잭션이 끝날 때까지 다른 이슈 생성은 번호를 받지 못하고 기다린다.
+    with transaction.atomic():
+        Project.objects.filter(pk=project_id).update(last_issue_number=F('last_issue_number') + 1)
+        return Project.objects.filter(pk=project_id).values_list('key', 'last_issue_number').get()
+
+
+def generate_key(sender, instance, **kwargs):
+    if instance._state.adding and instance.key is None:
+        project_key, key_num = next_issue_number(instance.project_id)
+        instance.key = project_key + '-' + str(key_num)
 
 
 def subscribe_author_when_created(sender, instance: Issue, created, **kwargs):
@@ -90,8 +177,34 @@ def subscribe_author_when_created(sender, instance: Issue, created, **kwargs):
         instance.subscribers.add(instance.author)
 
 
-post_save.connect(generate_key, sender=Issue)
+def skip_history_for_non_auditable_changes(sender, instance: Issue, update_fields=None, **kwargs):
+    # 순서처럼 감사할 필요가 없는 필드만 바뀐 저장은 히스토리, IssueHistory, 알림을 모두 남기지 않는다.
+    if instance._state.adding:
+        return
+
+    changed_fields = instance.get_changed_fields(update_fields)
+    if changed_fields and changed_fields <= set(settings.ISSUE_NON_AUDITABLE_FIELDS) | {'updated_at'}:
+        instance.skip_history_when_saving = True
+
+
+def update_search_document_when_text_changed(sender, instance: Issue, created, update_fields=None, **kwargs):
+    changed_fields = instance.get_changed_fields(update_fields)
+    if created or changed_fields is None or changed_fields & {'title', 'body'}:
+        update_issue_search_documents([instance.id])
+
+
+def reset_tracked_values(sender, instance: Issue, **kwargs):
+    if hasattr(instance, 'skip_history_when_saving'):
+        del instance.skip_history_when_saving
+    instance._loaded_values = {field.attname: getattr(instance, field.attname)
+                               for field in instance._meta.concrete_fields}
+
+
+pre_save.connect(generate_key, sender=Issue)
+pre_save.connect(skip_history_for_non_auditable_changes, sender=Issue)
 post_save.connect(subscribe_author_when_created, sender=Issue)
+post_save.connect(update_search_document_when_text_changed, sender=Issue)
+post_save.connect(reset_tracked_values, sender=Issue)
 
 
 class IssueSubscription(models.Model):
@@ -107,9 +220,56 @@ class Comment(BaseModel):
     issue = models.ForeignKey(Issue, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='issue_comments')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['issue', '-created_at'], condition=Q(deleted_at=None),
+                         name='comment_alive_issue_idx'),
+        ]
+
+
+# 한국어 형태소 사전이 없으므로 공백 단위로 자르는 simple 설정을 쓰고, 검색어는 앞부분 일치로 찾는다.
+ISSUE_SEARCH_CONFIG = 'simple'
+
+
+class IssueSearchDocument(models.Model):
+    # 이슈 제목(A), 본문(B), 지우지 않은 댓글(C)로 만든 검색 벡터. 이슈나 댓글을 저장할 때 그 이슈의 행만 다시 만든다.
+    # GIN 인덱스는 Postgres 에서만 마이그레이션이 만든다.
+    issue = models.OneToOneField(Issue, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    vector = SearchVectorField()
+
+
+def update_issue_search_documents(issue_ids=None):
+    """
+    issue_ids 의 검색 벡터를 다시 만든다. None 이면 모든 이슈를 다시 만든다. Postgres 가 아니면 아무것도 하지 않는다.
+    """
+    if connection.vendor != 'postgresql':
+        return
+
+    where = '' if issue_ids is None else 'WHERE i.id = ANY(%(issue_ids)s)'
+    with connection.cursor() as cursor:
+        cursor.execute('''
+            INSERT INTO issue_issuesearchdocument (issue_id, vector)
+            SELECT i.id,
+                   setweight(to_tsvector(%(config)s, coalesce(i.title, '')), 'A') ||
+                   setweight(to_tsvector(%(config)s, coalesce(i.body, '')), 'B') ||
+                   setweight(to_tsvector(%(config)s, coalesce((
+                       SELECT string_agg(c.content, ' ') FROM issue_comment c
+                       WHERE c.issue_id = i.id AND c.deleted_at IS NULL
+                   ), '')), 'C')
+            FROM issue_issue i {}
+            ON CONFLICT (issue_id) DO UPDATE SET vector = EXCLUDED.vector
+        '''.format(where), {'config': ISSUE_SEARCH_CONFIG, 'issue_ids': list(issue_ids or [])})
+
+
+def update_comment_issue_search_document(sender, instance: Comment, **kwargs):
+    update_issue_search_documents([instance.issue_id])
+
+
+post_save.connect(update_comment_issue_search_document, sender=Comment)
+
 
 class Tag(models.Model):
-    name = models.CharField(max_length=30)
+    name = models.CharField(max_length=30, db_index=True)
 
 
 class IssueTagging(models.Model):
@@ -127,94 +287,167 @@ class IssueHistory(models.Model):
 
     class Meta:
         ordering = ['-history_date']
+        indexes = [
+            models.Index(fields=['issue_id', '-history_date'], name='issue_history_issue_date_idx'),
+        ]
+
+
+class IssueChange(models.Model):
+    # IssueHistory 가 생길 때 계산해 둔 필드 단위 변경 이력. 이력 조회는 이 테이블만 읽는다.
+    issue_history = models.ForeignKey(IssueHistory, on_delete=models.CASCADE, related_name='changes')
+    issue_id = models.PositiveIntegerField()
+    field = models.CharField(max_length=64, null=True)
+    old_value = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    new_value = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    type = models.CharField(max_length=1)
+    actor_id = models.PositiveIntegerField(null=True)
+    actor_username = models.CharField(max_length=40, null=True)
+    date = models.DateTimeField()
 
+    class Meta:
+        ordering = ['-date', 'id']
+        indexes = [
+            models.Index(fields=['issue_id', '-date', 'id'], name='issue_change_issue_date_idx'),
+        ]
 
-def get_change_from_histories(histories):
+
+def diff_issue_records(record, prev_record, excluded_fields):
+    # HistoricalIssue.diff_against 는 model_to_dict 로 현재 이슈의 다대다 필드까지 조회하므로, 컬럼 값만 직접 비교한다.
+    changes = []
+    for field in Issue._meta.concrete_fields:
+        if not field.editable or field.name in excluded_fields:
+            continue
+
+        old_value, new_value = field.value_from_object(prev_record), field.value_from_object(record)
+        if old_value != new_value:
+            changes.append(ModelChange(field.name, old_value, new_value))
+
+    return changes
+
+
+def get_history_changes(history, prev_record, usernames=None):
+    # usernames: 담당자 변경의 사용자명을 미리 불러 둔 {id: username}. 없으면 하나씩 조회한다.
     User = get_user_model()
+    user = history.history_user
+    base = {
+        'user': {'id': user.id if user else None, 'username': user.username if user else None},
+        'type': history.history_type,
+        'date': history.history_date,
+    }
+
+    def get_assignee(pk):
+        if usernames is not None:
+            return {'id': pk, 'username': usernames.get(pk)}
+        assignee = get_or_none_if_pk_is_none(User, pk)
+        return {'id': pk, 'username': assignee.username if assignee else None}
+
     result = []
-    for issue_history in histories:
-        history = issue_history.history
-        if history.__class__ == Issue.history.model:
-            if history.prev_record:
-                delta = history.diff_against(history.prev_record, excluded_fields=['order', 'project', ])
-                for change in delta.changes:
-                    if change.field == 'key':
-                        continue
-
-                    data = {
-                        'field': change.field,
-                        'user': {'id': history.history_user.id, 'username': history.history_user.username},
-                        'type': history.history_type,
-                        'date': history.history_date,
-                    }
-                    if change.field == 'assignee':
-                        old_assignee = get_or_none_if_pk_is_none(User, change.old)
-                        new_assignee = get_or_none_if_pk_is_none(User, change.new)
-                        data['old_value'] = {'id': change.old,
-                                             'username': old_assignee.username if old_assignee else None}
-                        data['new_value'] = {'id': change.new,
-                                             'username': new_assignee.username if new_assignee else None}
-                    else:
-                        data['old_value'] = change.old
-                        data['new_value'] = change.new
-
-                    result.append(data)
-            else:
-                result.append({
-                    'field': None,
-                    'old_value': None,
-                    'new_value': None,
-                    'user': {'id': history.history_user.id, 'username': history.history_user.username},
-                    'type': history.history_type,
-                    'date': history.history_date,
-                })
-        elif history.__class__ == IssueTagging.history.model:
-            result.append({
-                'field': 'tags',
-                'old_value': None,
-                'new_value': history.tag.name,
-                'user': {'id': history.history_user.id, 'username': history.history_user.username},
-                'type': history.history_type,
-                'date': history.history_date
-            })
+    if history.__class__ == Issue.history.model:
+        if prev_record:
+            for change in diff_issue_records(history, prev_record,
+                                             excluded_fields=settings.ISSUE_NON_AUDITABLE_FIELDS + ['project']):
+                if change.field == 'key':
+                    continue
+
+                data = dict(base, field=change.field)
+                if change.field == 'assignee':
+                    data['old_value'] = get_assignee(change.old)
+                    data['new_value'] = get_assignee(change.new)
+                else:
+                    data['old_value'] = change.old
+                    data['new_value'] = change.new
+
+                result.append(data)
         else:
-            raise TypeError('이슈와 이슈태깅 히스토리컬 모델이 아닙니다.')
+            result.append(dict(base, field=None, old_value=None, new_value=None))
+    elif history.__class__ == IssueTagging.history.model:
+        result.append(dict(base, field='tags', old_value=None, new_value=history.tag.name))
+    else:
+        raise TypeError('이슈와 이슈태깅 히스토리컬 모델이 아닙니다.')
 
     return result
 
 
-def notify_issue_changes(sender, instance, created, **kwargs):
-    issue = Issue.objects.get(id=instance.issue_id)
-    actor = instance.history.history_user
-    issue_subscribers = issue.subscribers.exclude(id=actor.id)
+def get_change_from_histories(histories):
+    # 히스토리 N개를 변경 목록으로 바꿀 때 쿼리 수가 N에 비례하지 않도록 관련 객체를 한꺼번에 불러온다.
+    HistoricalIssue = Issue.history.model
+    histories = prefetch_generic_foreign_key(histories, 'history', select_related={
+        HistoricalIssue: ['history_user'],
+        IssueTagging.history.model: ['history_user', 'tag'],
+    })
 
-    if not issue_subscribers.exists():
-        return
+    issue_records = [h.history for h in histories if h.history.__class__ == HistoricalIssue]
+    prev_records = get_prev_records(issue_records)
+
+    assignee_ids = {record.assignee_id for record in issue_records + list(prev_records.values())}
+    usernames = dict(get_user_model().objects.filter(id__in=assignee_ids - {None}).values_list('id', 'username'))
 
-    # change = get_change_from_histories([instance])[0]
-
-    h = instance.history
-    if h.__class__ == Issue.history.model:  # HistoricalIssue
-        if h.history_type == "+":
-            description = "이슈를 생성했습니다."
-            verb = "생성"
-        elif h.history_type == "-":
-            description = "이슈를 삭제했습니다."
-            verb = "삭제"
-        else:  # h.history_type == "~"
-            description = "이슈를 업데이트헀습니다."
-            verb = "업데이트"
+    result = []
+    for issue_history in histories:
+        history = issue_history.history
+        result += get_history_changes(history, prev_records.get(history.history_id), usernames)
+
+    return result
+
+
+def get_prev_records(issue_records):
+    # {history_id: 바로 이전 HistoricalIssue}. prev_record 를 하나씩 부르는 대신 두 번의 쿼리로 가져온다.
+    if not issue_records:
+        return {}
+
+    HistoricalIssue = Issue.history.model
+    prev_history_ids = dict(HistoricalIssue.objects.filter(history_id__in=[r.history_id for r in issue_records])
+                            .annotate(prev_history_id=Subquery(
+                                HistoricalIssue.objects.filter(id=OuterRef('id'),
+                                                               history_date__lt=OuterRef('history_date'))
+                                .order_by('-history_date').values('history_id')[:1]))
+                            .values_list('history_id', 'prev_history_id'))
+    prevs = HistoricalIssue.objects.in_bulk([pk for pk in prev_history_ids.values() if pk is not None])
+    return {history_id: prevs[prev_id] for history_id, prev_id in prev_history_ids.items() if prev_id is not None}
+
+
+def build_issue_changes(issue_history, changes):
+    return [
+        IssueChange(
+            issue_history=issue_history,
+            issue_id=issue_history.issue_id,
+            field=change['field'],
+            old_value=change['old_value'],
+            new_value=change['new_value'],
+            type=change['type'],
+            actor_id=change['user']['id'],
+            actor_username=change['user']['username'],
+            date=change['date'],
+        )
+        for change in changes
+    ]
+
+
+def get_issue_event_verb(history):
+    # (verb, description)
+    if history.__class__ == Issue.history.model:  # HistoricalIssue
+        if history.history_type == "+":
+            return "생성", "이슈를 생성했습니다."
+        elif history.history_type == "-":
+            return "삭제", "이슈를 삭제했습니다."
+        else:  # history.history_type == "~"
+            return "업데이트", "이슈를 업데이트헀습니다."
     else:  # HistoricalIssueTagging, 태그는 추가, 삭제 모두 이슈 업데이트로 알림.
-        description = "이슈를 업데이트했습니다."
-        verb = "업데이트"
+        return "업데이트", "이슈를 업데이트했습니다."
+
 
-    # issue_data = {'id': issue.id, 'key': issue.key, 'title': issue.title, 'project_id': issue.project.id, 'change': change}
+class IssueEventOutbox(models.Model):
+    # 알림을 보내야 하는 이슈 변경. 요청에서는 이 행만 쓰고, 알림은 run_outbox 워커가 만든다.
+    issue_history = models.ForeignKey(IssueHistory, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
 
-    notify.send(actor, recipient=issue_subscribers, verb=verb, target=instance,
-                description=description)
+
+def enqueue_issue_event(sender, instance: IssueHistory, created, **kwargs):
+    if created:
+        IssueEventOutbox.objects.create(issue_history=instance)
 
 
-post_save.connect(notify_issue_changes, sender=IssueHistory)
+post_save.connect(enqueue_issue_event, sender=IssueHistory)
 
 
 def create_issue_history(sender, instance, created, **kwargs):
@@ -227,27 +460,48 @@ def create_issue_history(sender, instance, created, **kwargs):
     else:
         raise TypeError('이슈와 이슈태깅 히스토리컬 모델이 아닙니다.')
 
-    try:
-        issue_history = IssueHistory.objects.get(
-            content_type=content_type,
-            history_id=instance.history_id,
-            issue_id=issue_id
-        )
-    except IssueHistory.DoesNotExist:
-        issue_history = IssueHistory(
-            content_type=content_type,
-            history_id=instance.history_id,
-            issue_id=issue_id
-        )
-
-    issue_history.history_date = instance.history_date
-    issue_history.save()
+    # IssueHistory, IssueChange, IssueEventOutbox 는 한 트랜잭션에서 함께 기록한다.
+    with transaction.atomic():
+        try:
+            issue_history = IssueHistory.objects.get(
+                content_type=content_type,
+                history_id=instance.history_id,
+                issue_id=issue_id
+            )
+        except IssueHistory.DoesNotExist:
+            issue_history = IssueHistory(
+                content_type=content_type,
+                history_id=instance.history_id,
+                issue_id=issue_id
+            )
+
+        is_new_issue_history = issue_history.pk is None
+        issue_history.history_date = instance.history_date
+        issue_history.save()
+
+        if is_new_issue_history:
+            prev_record = instance.prev_record if sender == Issue.history.model else None
+            IssueChange.objects.bulk_create(
+                build_issue_changes(issue_history, get_history_changes(instance, prev_record)))
 
 
 post_save.connect(create_issue_history, sender=Issue.history.model)
 post_save.connect(create_issue_history, sender=IssueTagging.history.model)
 
 
+class ArchivedRecord(models.Model):
+    # 오래전에 지운 프로젝트, 이슈, 댓글과 그 이력을 옮겨 두는 테이블. archive_deleted 명령이 채운다.
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['content_type', 'object_id'], name='archived_record_object_idx'),
+        ]
+
+
 def attachment_directory_path(instance, filename):
     return 'attachment/{0}/{1}'.format(instance.project.name, filename)
 
@@ -261,6 +515,14 @@ class Attachment(models.Model):
     content_id = models.PositiveIntegerField()
     content = GenericForeignKey('content_type', 'content_id')
 
+    class Meta:
+        # 프로젝트 첨부파일 목록과 이슈별 첨부파일 목록(content_type, content_id)을 모두 최신순으로 읽는다.
+        indexes = [
+            models.Index(fields=['project', '-uploaded_at'], name='attachment_project_date_idx'),
+            models.Index(fields=['project', 'content_type', 'content_id', '-uploaded_at'],
+                         name='attachment_content_date_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
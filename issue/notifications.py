@@ -0,0 +1,109 @@
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+from notifications.models import Notification
+
+from accounts.models import increment_unread_counts
+from accounts.stream import publish_notifications
+from issue.models import Issue, IssueTagging, IssueHistory, IssueSubscription, IssueEventOutbox, get_issue_event_verb
+from smallissue.utils import prefetch_generic_foreign_key
+
+# bulk_create 한 번에 넣을 알림 수
+NOTIFICATION_BATCH_SIZE = 500
+
+
+def build_notifications(actor, recipient_ids, verb, target, description=None, timestamp=None, data=None):
+    """
+    notify.send 와 같은 알림을 저장하지 않고 만든다. 콘텐츠 타입은 수신자 수와 관계없이 한 번만 구한다.
+    """
+    actor_content_type = ContentType.objects.get_for_model(actor)
+    target_content_type = ContentType.objects.get_for_model(target)
+    timestamp = timestamp or timezone.now()
+
+    return [Notification(
+        recipient_id=recipient_id,
+        actor_content_type=actor_content_type,
+        actor_object_id=actor.pk,
+        verb=verb,
+        description=description,
+        target_content_type=target_content_type,
+        target_object_id=target.pk,
+        timestamp=timestamp,
+        data=data,
+    ) for recipient_id in recipient_ids]
+
+
+def bulk_notify(actor, recipient_ids, verb, target, description=None, data=None, batch_size=NOTIFICATION_BATCH_SIZE):
+    """
+    notify.send(actor, recipient=..., ...) 대신 사용한다. 수신자마다 INSERT 하지 않고
+    batch_size 개씩 묶어 bulk_create 한다. notify 시그널은 보내지 않는다.
+    """
+    notifications = build_notifications(actor, recipient_ids, verb, target, description, data=data)
+    with transaction.atomic():
+        increment_unread_counts(n.recipient_id for n in notifications)
+        notifications = Notification.objects.bulk_create(notifications, batch_size=batch_size)
+        publish_notifications(notifications)
+        return notifications
+
+
+def get_issue_notification_data(issue_history, issue, actor):
+    """
+    알림 목록을 그릴 때 필요한 값을 보낼 때 Notification.data 에 저장해 둔다.
+    issue 는 Issue 또는 HistoricalIssue 이다.
+    """
+    return {
+        'history_id': issue_history.history_id,
+        'issue': {'id': issue.id, 'key': issue.key, 'title': issue.title, 'project_id': issue.project_id},
+        'actor': {'id': actor.id, 'username': actor.username},
+    }
+
+
+def process_issue_events(batch_size=100):
+    """
+    IssueEventOutbox 에 쌓인 이슈 변경을 batch_size 개씩 꺼내 구독자 알림을 만든다.
+    처리한 이벤트 수를 돌려준다. 처리한 행은 같은 트랜잭션에서 지운다.
+    """
+    with transaction.atomic():
+        events = list(IssueEventOutbox.objects.select_for_update(skip_locked=True).order_by('id')[:batch_size])
+        if not events:
+            return 0
+
+        issue_histories = IssueHistory.objects.in_bulk([event.issue_history_id for event in events])
+        prefetch_generic_foreign_key(issue_histories.values(), 'history', select_related={
+            Issue.history.model: ['history_user'],
+            IssueTagging.history.model: ['history_user'],
+        })
+
+        subscribers = defaultdict(set)
+        issue_ids = {issue_history.issue_id for issue_history in issue_histories.values()}
+        for issue_id, subscriber_id in IssueSubscription.objects.filter(issue_id__in=issue_ids) \
+                .values_list('issue_id', 'subscriber_id'):
+            subscribers[issue_id].add(subscriber_id)
+        issues = Issue.all_objects.only('id', 'key', 'title', 'project_id').in_bulk(issue_ids)
+
+        now = timezone.now()
+        notifications = []
+        for event in events:
+            issue_history = issue_histories.get(event.issue_history_id)
+            history = issue_history.history if issue_history else None
+            actor = history.history_user if history else None
+            if actor is None:  # 요청 밖(쉘, 관리 명령)에서 생긴 변경은 알림을 보내지 않는다.
+                continue
+
+            # 지운 이슈도 all_objects 로 읽는다. 아카이브되어 없으면 HistoricalIssue 의 값을 대신 쓰고, 그것도 없으면 data 없이 보낸다.
+            issue = issues.get(issue_history.issue_id)
+            if issue is None and isinstance(history, Issue.history.model):
+                issue = history
+            data = get_issue_notification_data(issue_history, issue, actor) if issue else None
+
+            verb, description = get_issue_event_verb(history)
+            recipient_ids = sorted(subscribers[issue_history.issue_id] - {actor.id})
+            notifications += build_notifications(actor, recipient_ids, verb, issue_history, description, now, data)
+
+        increment_unread_counts(n.recipient_id for n in notifications)
+        Notification.objects.bulk_create(notifications, batch_size=NOTIFICATION_BATCH_SIZE)
+        publish_notifications(notifications)
+        IssueEventOutbox.objects.filter(id__in=[event.id for event in events]).delete()
+        return len(events)
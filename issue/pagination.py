@@ -1,4 +1,11 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination, BasePagination
 from rest_framework.response import Response
 
 
@@ -12,4 +19,133 @@ class DefaultPagination(PageNumberPagination):
             'list': data,
             'page_size': self.page_size,
             'current_page': self.page.number
-        })
\ No newline at end of file
+        })
+
+
+class CursorJSONEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder 는 시각을 밀리초까지만 남긴다. 커서의 값은 행의 값과 정확히 같아야 하므로 마이크로초까지 남긴다.
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+# COUNT(*) 없이 정렬 키 값으로 다음/이전 페이지를 찾는 커서 페이지네이션.
+# ordering 의 마지막 필드는 유일해야 하며(보통 id), null 값은 항상 마지막에 정렬된다.
+class KeysetPagination(BasePagination):
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering = ('order', 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(view)
+
+        values, reverse = self.decode_cursor(request.query_params.get(self.cursor_query_param))
+
+        if values is not None:
+            queryset = queryset.filter(self.get_keyset_filter(values, reverse))
+        queryset = queryset.order_by(*self.get_order_by(reverse))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = values is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'list': data,
+            'page_size': self.page_size,
+            'next': self.get_next_cursor(),
+            'previous': self.get_previous_cursor(),
+        })
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, view):
+        return getattr(view, 'keyset_ordering', self.ordering)
+
+    def get_next_cursor(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]), reverse=False)
+
+    def get_previous_cursor(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[0]), reverse=True)
+
+    def get_position(self, instance):
+        return [getattr(instance, field.lstrip('-')) for field in self.ordering]
+
+    def encode_cursor(self, values, reverse):
+        data = json.dumps({'v': values, 'r': int(reverse)}, separators=(',', ':'), cls=CursorJSONEncoder)
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None, False
+
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            values, reverse = data['v'], bool(data['r'])
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound('잘못된 커서입니다.')
+
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound('잘못된 커서입니다.')
+        return values, reverse
+
+    def get_order_by(self, reverse):
+        order_by = []
+        for field in self.ordering:
+            descending = field.startswith('-')
+            expression = F(field.lstrip('-'))
+            if descending != reverse:
+                order_by.append(expression.desc(nulls_last=not reverse, nulls_first=reverse))
+            else:
+                order_by.append(expression.asc(nulls_last=not reverse, nulls_first=reverse))
+        return order_by
+
+    def get_keyset_filter(self, values, reverse):
+        # (a, b) > (x, y)  ==  a > x  OR  (a = x AND b > y)
+        keyset_filter = Q(pk__in=[])
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            descending = field.startswith('-')
+
+            if reverse:
+                # null 은 항상 마지막이므로 이전 방향에서는 null 이 아닌 값이 모두 null 보다 앞선다.
+                if value is None:
+                    keyset_filter |= equal & Q(**{f'{name}__isnull': False})
+                else:
+                    keyset_filter |= equal & Q(**{f'{name}__gt' if descending else f'{name}__lt': value})
+            elif value is not None:
+                keyset_filter |= equal & (Q(**{f'{name}__lt' if descending else f'{name}__gt': value}) |
+                                          Q(**{f'{name}__isnull': True}))
+
+            if value is None:
+                equal &= Q(**{f'{name}__isnull': True})
+            else:
+                equal &= Q(**{name: value})
+
+        return keyset_filter
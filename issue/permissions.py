@@ -7,31 +7,57 @@ from issue.models import Issue, Project, Comment, Team, Participation, Attachmen
 User = get_user_model()
 
 
+def get_project_membership(request, project_id):
+    """
+    요청한 사용자의 프로젝트 참여 정보(Participation, project 포함)를 돌려준다. 참여하지 않았으면 None.
+    한 요청 안에서는 프로젝트마다 한 번만 조회한다.
+    """
+    try:
+        project_id = int(project_id)
+    except (TypeError, ValueError):
+        return None
+
+    memberships = getattr(request, '_project_memberships', None)
+    if memberships is None:
+        memberships = request._project_memberships = {}
+
+    if project_id not in memberships:
+        memberships[project_id] = Participation.objects.select_related('project') \
+            .filter(project_id=project_id, user_id=request.user.id).first()
+    return memberships[project_id]
+
+
+def get_project_id(obj):
+    if isinstance(obj, (Issue, Team, Attachment, Participation)):
+        return obj.project_id
+    elif isinstance(obj, Comment):
+        return obj.issue.project_id
+    elif isinstance(obj, Project):
+        return obj.id
+
+    raise PermissionError('ProjectUsersOnly에 해당 뷰에 대한 권한 설정이 없습니다.')
+
+
 class ProjectUsersOnly(BasePermission):
-    def has_object_permission(self, request, view, obj):
-        if isinstance(obj, Issue) or isinstance(obj, Team):
-            return obj.project.users.filter(id=request.user.id).exists()
-        elif isinstance(obj, Comment):
-            return obj.issue.project.users.filter(id=request.user.id).exists()
-        elif isinstance(obj, Attachment):
-                return obj.project.users.filter(id=request.user.id).exists()
-        elif isinstance(obj, Participation):
-            return obj.project.users.filter(id=request.user.id).exists()
-        elif isinstance(obj, Project):
-            return obj.users.filter(id=request.user.id).exists()
+    def has_permission(self, request, view):
+        # projects/<project_pk>/ 아래의 뷰는 목록, 생성 요청도 프로젝트 참여자만 할 수 있다.
+        if 'project_pk' in view.kwargs:
+            return get_project_membership(request, view.kwargs['project_pk']) is not None
+        return True
 
-        raise PermissionError('ProjectUsersOnly에 해당 뷰에 대한 권한 설정이 없습니다.')
+    def has_object_permission(self, request, view, obj):
+        return get_project_membership(request, get_project_id(obj)) is not None
 
 
 class ProjectLeaderOnly(BasePermission):
     def has_object_permission(self, request, view, obj):
         if isinstance(obj, Participation):
-            return obj.project.leader.id == request.user.id
+            membership = get_project_membership(request, obj.project_id)
+            return membership is not None and membership.project.leader_id == request.user.id
         else:
-            return obj.leader.id == request.user.id
+            return obj.leader_id == request.user.id
 
 
 class IsAuthorOnly(BasePermission):
     def has_object_permission(self, request, view, obj: Comment):
-        return obj.author == request.user
-
+        return obj.author_id == request.user.id
@@ -1,8 +1,10 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
-from issue.models import Project, Issue, Comment, Tag, Team, Participation, Attachment
+from issue.models import Project, Issue, Comment, Tag, Team, Participation, Attachment, IssueChange, \
+    get_next_issue_order
 
 User = get_user_model()
 
@@ -15,11 +17,23 @@ class ProjectSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
     def to_internal_value(self, data):
+        # form 요청의 QueryDict 는 바꿀 수 없으므로 dict 로 옮긴다. 여러 값인 users 는 목록으로 둔다.
+        if hasattr(data, 'getlist'):
+            data = {key: data.getlist(key) if key == 'users' else data[key] for key in data}
+        else:
+            data = dict(data)
         try:
             user = User.objects.get(pk=data['leader'])
         except User.DoesNotExist:
             raise ValueError('user does not exist')
 
+        # CheckProjectKeyAvailableAPIView 와 같이 리더가 참여한 프로젝트끼리 키가 겹치지 않게 한다.
+        projects = user.projects.all()
+        if self.instance is not None:
+            projects = projects.exclude(pk=self.instance.pk)
+        if projects.filter(key=data.get('key')).exists():
+            raise ValidationError({'key': '프로젝트에서 이미 사용하고 있는 키값입니다.'})
+
         data['leader'] = user
         return data
 
@@ -47,7 +61,7 @@ class IssueSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
     def create(self, validated_data):
-        validated_data['order'] = Issue.objects.count()
+        validated_data['order'] = get_next_issue_order(validated_data['project'].id)
         return super(IssueSerializer, self).create(validated_data)
 
     def to_representation(self, instance):
@@ -61,6 +75,25 @@ class IssueSerializer(serializers.ModelSerializer):
         return result
 
 
+# 이슈 목록용. IssueSerializer와 응답 형태는 같고, assignee/subscribers/tags는 미리 불러온 값을 사용한다.
+class IssueListSerializer(IssueSerializer):
+    subscribers = serializers.SerializerMethodField()
+    tags = serializers.SerializerMethodField()
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('assignee').prefetch_related(
+            Prefetch('subscribers', queryset=User.objects.only('id')),
+            Prefetch('tags', queryset=Tag.objects.only('id')),
+        )
+
+    def get_subscribers(self, obj: Issue):
+        return [user.pk for user in obj.subscribers.all()]
+
+    def get_tags(self, obj: Issue):
+        return [tag.pk for tag in obj.tags.all()]
+
+
 class ProjectParticipationSerializer(serializers.ModelSerializer):
     user = ProjectUserSerializer()
     team = serializers.SerializerMethodField()
@@ -124,6 +157,17 @@ class IssueDetailSerializer(serializers.ModelSerializer):
         return result
 
 
+class IssueChangeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = IssueChange
+        fields = ['field', 'old_value', 'new_value', 'type', 'date']
+
+    def to_representation(self, instance: IssueChange):
+        result = super(IssueChangeSerializer, self).to_representation(instance)
+        result['user'] = {'id': instance.actor_id, 'username': instance.actor_username}
+        return result
+
+
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tag
@@ -153,10 +197,8 @@ class AttachmentSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         result = super(AttachmentSerializer, self).to_representation(instance)
-        try:
-            author = User.objects.get(id=result['author'])
-        except User.DoesNotExist:
+        if instance.author is None:
             raise ValidationError('파일의 게시자가 존재하지 않습니다.')
 
-        result['author'] = ProjectUserSerializer(author).data
+        result['author'] = ProjectUserSerializer(instance.author).data
         return result
\ No newline at end of file
@@ -1,8 +1,51 @@
+import io
+import threading
+from datetime import timedelta
+from unittest import skipUnless
+
 from django.contrib.auth import get_user_model
-from rest_framework.test import APITestCase, APIClient
+from django.contrib.auth.models import Permission
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.contrib.contenttypes.models import ContentType
+from rest_framework.request import Request
+from rest_framework.test import APITestCase, APIClient, APIRequestFactory
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from issue.models import Project, Issue
+from issue.models import Project, Issue, Tag, IssueTagging, IssueHistory, IssueChange, Comment, ArchivedRecord, \
+    IssueEventOutbox, Attachment, Participation, Team, ISSUE_ORDER_STEP, get_change_from_histories, \
+    update_issue_search_documents
+from issue.serializers import IssueSerializer
+from issue.views import ProjectViewSet, ProjectIssueViewSet, ProjectCommentViewSet, ProjectParticipationViewSet, \
+    ProjectTeamViewSet, ProjectTeamUsersViewSet, AttachmentViewSet, ISSUE_SORTS, filter_issues, search_issues
+
+
+def get_unindexed_scans(queryset):
+    """
+    queryset 의 실행 계획에서 인덱스 조건 없이 테이블을 걸러내는 노드(순차 스캔, Index Cond 없이 Filter 만 있는 인덱스 스캔)를
+    돌려준다. PostgreSQL 의 EXPLAIN (FORMAT JSON) 을 쓴다.
+    테스트 DB 는 작아서 플래너가 순차 스캔을 고르므로 순차 스캔을 끄고 계획을 세운다.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        try:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+        finally:
+            cursor.execute('SET LOCAL enable_seqscan = on')
+
+    scans, nodes = [], [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        nodes += node.get('Plans', [])
+        if node['Node Type'] == 'Seq Scan' or \
+                node['Node Type'] in ('Index Scan', 'Index Only Scan') and 'Index Cond' not in node and 'Filter' in node:
+            scans.append('{} on {}'.format(node['Node Type'], node['Relation Name']))
+    return scans
 
 
 class ProjectTestCase(APITestCase):
@@ -57,6 +100,44 @@ class ProjectTestCase(APITestCase):
         self.assertEqual(res.status_code, 400)
 
 
+class ProjectSerializerTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create(email='test@test.co', username='test')
+        cls.other = User.objects.create(email='other@test.co', username='other')
+        cls.user.user_permissions.add(*Permission.objects.filter(codename__in=['add_project', 'change_project']))
+        cls.project = Project.objects.create(name='project1', key='PJ', leader=cls.user)
+        cls.user.projects.add(cls.project)
+
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def test_폼으로_보낸_참여자_목록을_모두_저장한다(self):
+        data = {'name': 'project2', 'key': 'P2', 'leader': self.user.pk, 'users': [self.user.pk, self.other.pk]}
+        res = self.client.post('/projects/', data, format='multipart')
+        self.assertEqual(res.status_code, 201)
+        project = Project.objects.get(key='P2')
+        self.assertEqual(set(project.users.values_list('id', flat=True)), {self.user.id, self.other.id})
+
+    def test_리더가_참여한_프로젝트와_키가_겹치면_400을_돌려준다(self):
+        data = {'name': 'project2', 'key': 'PJ', 'leader': self.user.pk, 'users': [self.user.pk]}
+        res = self.client.post('/projects/', data, format='json')
+        self.assertEqual(res.status_code, 400)
+        self.assertIn('key', res.data)
+
+        data['key'] = 'P2'
+        res = self.client.post('/projects/', data, format='json')
+        self.assertEqual(res.status_code, 201)
+
+    def test_프로젝트를_수정할때_자기_키는_겹침으로_보지_않는다(self):
+        data = {'name': 'renamed', 'key': 'PJ', 'leader': self.user.pk, 'users': [self.user.pk]}
+        res = self.client.put(f'/projects/{self.project.id}/', data, format='json')
+        self.assertEqual(res.status_code, 200)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.name, 'renamed')
+
+
 class IssueTestCase(APITestCase):
     @classmethod
     def setUpTestData(cls):
@@ -89,7 +170,583 @@ class IssueTestCase(APITestCase):
             body="sdf",
             assignee=None,
             status=1,
-            project=project
+            project=project,
+            author=self.user,
+        )
+
+        self.assertEqual(issue.key, project.key + "-1")
+
+    def test_이슈_생성시_히스토리는_한번만_기록된다(self):
+        project = Project.objects.create(
+            name='project1',
+            key='PJ',
+            leader=self.user,
         )
 
-        self.assertEqual(issue.key, project.key+"1")
\ No newline at end of file
+        issue = Issue.objects.create(title="hehe", project=project, author=self.user)
+        issue2 = Issue.objects.create(title="hehe2", project=project, author=self.user)
+
+        self.assertEqual(issue.history.count(), 1)
+        self.assertEqual(issue.history.first().key, "PJ-1")
+        self.assertEqual(issue2.key, "PJ-2")
+
+    def test_순서만_바뀐_저장은_이력을_남기지않는다(self):
+        project = Project.objects.create(
+            name='project1',
+            key='PJ',
+            leader=self.user,
+        )
+        Issue.objects.create(title="hehe", project=project, author=self.user)
+        issue = Issue.objects.get(project=project)
+
+        issue.order = 10
+        issue.save()
+        self.assertEqual(issue.history.count(), 1)
+        self.assertEqual(IssueHistory.objects.filter(issue_id=issue.id).count(), 1)
+
+        issue.title = "hoho"
+        issue.save()
+        self.assertEqual(issue.history.count(), 2)
+
+        issue.order = 20
+        issue.save(update_fields=['order'])
+        self.assertEqual(issue.history.count(), 2)
+
+    def test_이슈_변경이력은_필드단위로_저장되고_백필할수있다(self):
+        project = Project.objects.create(
+            name='project1',
+            key='PJ',
+            leader=self.user,
+        )
+        self.user.projects.add(project)
+        issue = Issue(title="hehe", project=project, author=self.user)
+        issue._history_user = self.user
+        issue.save()
+        issue.title = "hoho"
+        issue.assignee = self.user
+        issue.save()
+
+        self.login(self.user)
+        res = self.client.get(f'/projects/{project.id}/issues/{issue.id}/history/')
+        self.assertEqual(res.status_code, 200)
+        changes = {change['field']: change for change in res.data['list']}
+        self.assertEqual(set(changes), {'title', 'assignee', None})
+        self.assertEqual(changes['title']['old_value'], 'hehe')
+        self.assertEqual(changes['title']['new_value'], 'hoho')
+        self.assertEqual(changes['assignee']['new_value'], {'id': self.user.id, 'username': 'test'})
+        self.assertEqual(changes['title']['user'], {'id': self.user.id, 'username': 'test'})
+
+        IssueChange.objects.all().delete()
+        call_command('backfill_issue_changes', stdout=io.StringIO())
+        call_command('backfill_issue_changes', stdout=io.StringIO())
+        res2 = self.client.get(f'/projects/{project.id}/issues/{issue.id}/history/')
+        self.assertEqual(res2.data['list'], res.data['list'])
+
+
+@skipUnless(connection.vendor == 'postgresql', '여러 스레드가 동시에 쓰는 것은 PostgreSQL 에서만 확인한다.')
+class IssueKeyConcurrencyTestCase(TransactionTestCase):
+    def test_동시에_이슈를_생성해도_키가_중복되지않는다(self):
+        User = get_user_model()
+        user = User.objects.create(email='test@test.co', password='test', username='test')
+        project = Project.objects.create(name='project1', key='PJ', leader=user)
+        thread_count = 8
+        barrier = threading.Barrier(thread_count)
+        errors = []
+
+        def create_issue(i):
+            try:
+                barrier.wait()
+                Issue.objects.create(title=f'issue{i}', project=project, author=user)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=create_issue, args=(i,)) for i in range(thread_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        keys = sorted(Issue.objects.filter(project=project).values_list('key', flat=True))
+        self.assertEqual(keys, sorted(f'PJ-{i + 1}' for i in range(thread_count)))
+
+
+class IssueListTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create(
+            email='test@test.co',
+            password='test',
+            username='test'
+        )
+        cls.project = Project.objects.create(
+            name='project1',
+            key='PJ',
+            leader=cls.user,
+        )
+        cls.user.projects.add(cls.project)
+        cls.tag = Tag.objects.create(name='tag1')
+
+    def login(self, user):
+        refresh_token = RefreshToken.for_user(user)
+        access_token = refresh_token.access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+
+    def create_issue(self, title):
+        issue = Issue(
+            title=title,
+            author=self.user,
+            assignee=self.user,
+            project=self.project,
+            order=Issue.objects.count(),
+        )
+        issue._history_user = self.user
+        issue.save()
+        issue.tags.add(self.tag)
+        return issue
+
+    def test_이슈목록_쿼리수는_이슈개수와_무관하다(self):
+        self.login(self.user)
+        self.create_issue('issue1')
+        self.client.get(f'/projects/{self.project.id}/issues/')  # 토큰의 사용자를 캐시해 둔다.
+
+        with self.assertNumQueries(4):
+            res = self.client.get(f'/projects/{self.project.id}/issues/')
+        self.assertEqual(len(res.data), 1)
+
+        for i in range(5):
+            self.create_issue(f'issue{i + 2}')
+
+        with self.assertNumQueries(4):
+            res = self.client.get(f'/projects/{self.project.id}/issues/')
+        self.assertEqual(len(res.data), 6)
+
+    def test_프로젝트_참여자만_이슈를_볼수있고_참여확인은_요청당_한번이다(self):
+        issue = self.create_issue('issue1')
+        self.login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(f'/projects/{self.project.id}/issues/{issue.id}/')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len([q for q in queries if 'issue_participation' in q['sql']]), 1)
+
+        outsider = get_user_model().objects.create(email='outsider@test.co', username='outsider')
+        self.login(outsider)
+        self.assertEqual(self.client.get(f'/projects/{self.project.id}/issues/').status_code, 403)
+        self.assertEqual(self.client.get(f'/projects/{self.project.id}/issues/{issue.id}/').status_code, 403)
+
+    def test_이슈목록은_이슈시리얼라이저와_같은형태로_응답한다(self):
+        self.login(self.user)
+        issue = self.create_issue('issue1')
+
+        res = self.client.get(f'/projects/{self.project.id}/issues/')
+        self.assertEqual(dict(res.data[0]), dict(IssueSerializer(issue).data))
+
+    def test_커서페이지네이션으로_이슈목록을_앞뒤로_탐색할수있다(self):
+        self.login(self.user)
+        issues = [self.create_issue(f'issue{i}') for i in range(5)]
+        Issue.objects.filter(id=issues[3].id).update(order=None)
+        expected = [issue.id for issue in issues if issue.id != issues[3].id] + [issues[3].id]
+
+        url = f'/projects/{self.project.id}/issues/?pagination=cursor&page_size=2'
+        ids = []
+        cursor = ''
+        pages = []
+        while cursor is not None:
+            res = self.client.get(url + f'&cursor={cursor}')
+            pages.append(res.data)
+            ids += [issue['id'] for issue in res.data['list']]
+            cursor = res.data['next']
+        self.assertEqual(ids, expected)
+        self.assertEqual(res.data['page_size'], 2)
+        self.assertIsNone(pages[0]['previous'])
+
+        res = self.client.get(url + f'&cursor={pages[-1]["previous"]}')
+        self.assertEqual(res.data['list'], pages[-2]['list'])
+
+    def test_커서페이지네이션은_count쿼리를_실행하지않는다(self):
+        self.login(self.user)
+        self.create_issue('issue1')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f'/projects/{self.project.id}/issues/?pagination=cursor')
+        self.assertFalse(any('COUNT(' in query['sql'].upper() for query in queries.captured_queries))
+
+
+class IssueOrderTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create(
+            email='test@test.co',
+            password='test',
+            username='test'
+        )
+        cls.user.user_permissions.add(Permission.objects.get(codename='change_issue'))
+        cls.project = Project.objects.create(
+            name='project1',
+            key='PJ',
+            leader=cls.user,
+        )
+        cls.user.projects.add(cls.project)
+        cls.issues = [
+            Issue.objects.create(title=f'issue{i}', author=cls.user, project=cls.project,
+                                 order=(i + 1) * ISSUE_ORDER_STEP)
+            for i in range(4)
+        ]
+
+    def login(self, user):
+        refresh_token = RefreshToken.for_user(user)
+        access_token = refresh_token.access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token}')
+
+    def ordered_ids(self):
+        return list(Issue.objects.filter(project=self.project).order_by('order', 'id').values_list('id', flat=True))
+
+    def test_이슈를_옮기면_한행만_수정된다(self):
+        self.login(self.user)
+        a, b, c, d = self.issues
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(f'/projects/{self.project.id}/issues/{d.id}/move/',
+                                    {'prev': a.id, 'next': b.id}, format='json')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.ordered_ids(), [a.id, d.id, b.id, c.id])
+
+        writes = [q['sql'] for q in queries.captured_queries if q['sql'].startswith(('UPDATE', 'INSERT'))]
+        self.assertEqual(len(writes), 1)
+
+        res = self.client.patch(f'/projects/{self.project.id}/issues/{a.id}/move/',
+                                {'prev': c.id, 'next': None}, format='json')
+        self.assertEqual(self.ordered_ids(), [d.id, b.id, c.id, a.id])
+
+    def test_이웃없이_옮기면_맨뒤로_간다(self):
+        self.login(self.user)
+        a, b, c, d = self.issues
+
+        res = self.client.patch(f'/projects/{self.project.id}/issues/{b.id}/move/',
+                                {'prev': None, 'next': None}, format='json')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.ordered_ids(), [a.id, c.id, d.id, b.id])
+        self.assertEqual(len(set(Issue.objects.values_list('order', flat=True))), 4)
+
+    def test_순서값_사이에_여유가없으면_다시매긴다(self):
+        self.login(self.user)
+        a, b, c, d = self.issues
+        Issue.objects.filter(id=b.id).update(order=a.order + 1)
+
+        res = self.client.patch(f'/projects/{self.project.id}/issues/{d.id}/move/',
+                                {'prev': a.id, 'next': b.id}, format='json')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.ordered_ids(), [a.id, d.id, b.id, c.id])
+
+    def test_전체순서_변경은_이력을_남기지않는다(self):
+        self.login(self.user)
+        a, b, c, d = self.issues
+        history_count = Issue.history.count()
+
+        res = self.client.patch(f'/projects/{self.project.id}/issues/set_orders/',
+                                {'new_orders': [c.id, a.id, d.id, b.id]}, format='json')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.ordered_ids(), [c.id, a.id, d.id, b.id])
+        self.assertEqual(Issue.history.count(), history_count)
+
+
+class IssueChangeQueryTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create(
+            email='test@test.co',
+            password='test',
+            username='test'
+        )
+        cls.project = Project.objects.create(
+            name='project1',
+            key='PJ',
+            leader=cls.user,
+        )
+
+    def create_histories(self, count):
+        issue = Issue(title='issue', project=self.project, author=self.user)
+        issue._history_user = self.user
+        issue.save()
+        for i in range(count):
+            issue.title = f'issue{i}'
+            issue.assignee = self.user if i % 2 else None
+            issue.save()
+        tagging = IssueTagging(issue=issue, tag=Tag.objects.create(name='tag'))
+        tagging._history_user = self.user
+        tagging.save()
+        return list(IssueHistory.objects.filter(issue_id=issue.id))
+
+    def test_히스토리_변경목록_쿼리수는_히스토리개수와_무관하다(self):
+        histories = self.create_histories(2)
+        with CaptureQueriesContext(connection) as small:
+            get_change_from_histories(IssueHistory.objects.filter(id__in=[h.id for h in histories]))
+
+        histories = self.create_histories(6)
+        with CaptureQueriesContext(connection) as large:
+            changes = get_change_from_histories(IssueHistory.objects.filter(id__in=[h.id for h in histories]))
+
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(len(changes), 1 + 6 + 5 + 1)
+
+
+class SoftDeleteTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(email='test@test.co', username='test')
+        cls.project = Project.objects.create(name='project1', key='PJ', leader=cls.user)
+
+    def create_issue(self, title):
+        issue = Issue(title=title, project=self.project, author=self.user)
+        issue._history_user = self.user
+        issue.save()
+        Comment.objects.create(issue=issue, author=self.user, content='comment')
+        return issue
+
+    def test_지운_이슈는_기본매니저에서_빠진다(self):
+        issue = self.create_issue('deleted')
+        issue.delete()
+
+        self.assertFalse(Issue.objects.filter(id=issue.id).exists())
+        self.assertTrue(Issue.all_objects.filter(id=issue.id).exists())
+
+    def test_오래전에_지운_이슈와_이력을_아카이브로_옮긴다(self):
+        alive = self.create_issue('alive')
+        deleted = self.create_issue('deleted')
+        deleted.delete()
+        Issue.all_objects.filter(id=deleted.id).update(deleted_at=timezone.now() - timedelta(days=100))
+
+        call_command('archive_deleted', '--days', '90', '--pause', '0', stdout=io.StringIO())
+
+        self.assertEqual(list(Issue.all_objects.values_list('id', flat=True)), [alive.id])
+        self.assertFalse(Comment.all_objects.filter(issue_id=deleted.id).exists())
+        self.assertFalse(IssueHistory.objects.filter(issue_id=deleted.id).exists())
+        self.assertFalse(Issue.history.filter(id=deleted.id).exists())
+        self.assertFalse(IssueEventOutbox.objects.filter(issue_history__issue_id=deleted.id).exists())
+        self.assertEqual(ArchivedRecord.objects.get(content_type__model='issue', object_id=deleted.id).data['title'],
+                         'deleted')
+        self.assertTrue(IssueHistory.objects.filter(issue_id=alive.id).exists())
+
+
+@skipUnless(connection.vendor == 'postgresql', '실행 계획은 PostgreSQL 에서만 확인한다.')
+class QueryPlanTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(email='test@test.co', username='test')
+        cls.project = Project.objects.create(name='project1', key='PJ', leader=cls.user)
+        Participation.objects.create(project=cls.project, user=cls.user)
+        # 참여하지 않은 프로젝트를 채워 둔다.
+        Project.objects.bulk_create([Project(name=f'other{i}', key='OT', leader=cls.user) for i in range(500)])
+        # 검색 문서가 몇 개뿐이면 플래너가 조인 조건 없이 기본키 인덱스를 끝까지 읽는 계획을 고른다.
+        other = Project.objects.filter(name='other0').get()
+        Issue.objects.bulk_create([Issue(title=f'other{i}', project=other, author=cls.user) for i in range(500)])
+        update_issue_search_documents()
+        cls.team = Team.objects.create(project=cls.project, name='team')
+        cls.team.users.add(cls.user)
+
+        cls.issue = Issue(title='issue', project=cls.project, author=cls.user)
+        cls.issue._history_user = cls.user
+        cls.issue.save()
+        Comment.objects.create(issue=cls.issue, author=cls.user, content='comment')
+        Attachment.objects.create(project=cls.project, author=cls.user, content_type=ContentType.objects.get_for_model(Issue),
+                                  content_id=cls.issue.id)
+        # 앞선 테스트가 롤백한 뒤 autovacuum 이 빈 테이블로 모은 통계가 남아 있으면 계획이 실행마다 달라진다.
+        # 채워 둔 테이블만 지금 데이터로 통계를 다시 모은다.
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE issue_project, issue_issue, issue_issuesearchdocument')
+
+    def get_queryset(self, viewset_class, query_params=None, **kwargs):
+        request = Request(APIRequestFactory().get('/', query_params))
+        request.user = self.user
+        return viewset_class(request=request, kwargs=kwargs, action='list', format_kwarg=None).get_queryset()
+
+    def test_뷰셋_목록쿼리는_순차스캔을_하지않는다(self):
+        project_pk, issue_pk = self.project.id, self.issue.id
+        issues = self.get_queryset(ProjectIssueViewSet, project_pk=project_pk)
+        querysets = {
+            'project': self.get_queryset(ProjectViewSet),
+            'issue': self.get_queryset(ProjectIssueViewSet, project_pk=project_pk),
+            'comment': self.get_queryset(ProjectCommentViewSet, project_pk=project_pk, issue_pk=issue_pk),
+            'participation': self.get_queryset(ProjectParticipationViewSet, project_pk=project_pk),
+            'team': self.get_queryset(ProjectTeamViewSet, project_pk=project_pk),
+            'team users': self.get_queryset(ProjectTeamUsersViewSet, project_pk=project_pk, team_pk=self.team.id),
+            'attachment': self.get_queryset(AttachmentViewSet, project_pk=project_pk),
+            'issue attachment': self.get_queryset(AttachmentViewSet, {'issue': issue_pk}, project_pk=project_pk),
+            'issue history': IssueHistory.objects.filter(issue_id=issue_pk),
+            'issue by status': filter_issues(issues, {'status': '0,1'}),
+            'issue by assignee': filter_issues(issues, {'assignee': self.user.id}),
+            'issue by tag': filter_issues(issues, {'tag': 'tag'}),
+            'issue by updated': issues.order_by(*ISSUE_SORTS['-updated_at']),
+            'issue search': search_issues(self.get_queryset(ProjectIssueViewSet, project_pk=project_pk), 'issue'),
+        }
+
+        for name, queryset in querysets.items():
+            with self.subTest(name):
+                self.assertEqual(get_unindexed_scans(queryset), [])
+
+
+class IssueSearchTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(email='test@test.co', username='test')
+        cls.project = Project.objects.create(name='project1', key='PJ', leader=cls.user)
+        cls.user.projects.add(cls.project)
+
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def create_issue(self, title, body=''):
+        issue = Issue(title=title, body=body, project=self.project, author=self.user)
+        issue._history_user = self.user
+        issue.save()
+        return issue
+
+    def search(self, q, cursor=None):
+        params = {'q': q, 'page_size': 2}
+        if cursor:
+            params['cursor'] = cursor
+        return self.client.get(f'/projects/{self.project.id}/issues/search/', params)
+
+    def test_제목_본문_댓글을_앞부분일치로_찾고_제목일치를_먼저_보여준다(self):
+        in_title = self.create_issue('로그인 버그')
+        in_body = self.create_issue('화면 깨짐', body='로그인하면 화면이 깨집니다')
+        in_comment = self.create_issue('기타')
+        self.create_issue('상관없음')
+        comment = Comment.objects.create(issue=in_comment, author=self.user, content='로그인 페이지도 확인')
+
+        res = self.search('로그인')
+        self.assertEqual([issue['id'] for issue in res.data['list']], [in_title.id, in_body.id])
+        res = self.search('로그인', res.data['next'])
+        self.assertEqual([issue['id'] for issue in res.data['list']], [in_comment.id])
+        self.assertIsNone(res.data['next'])
+
+        comment.delete()
+        in_title.title = '회원가입 버그'
+        in_title.save()
+        self.assertEqual([issue['id'] for issue in self.search('로그인').data['list']], [in_body.id])
+
+    def test_검색어가_없으면_400을_돌려준다(self):
+        self.assertEqual(self.search(' !? ').status_code, 400)
+
+
+class IssueFilterTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create(email='test@test.co', username='test')
+        cls.other = User.objects.create(email='other@test.co', username='other')
+        cls.project = Project.objects.create(name='project1', key='PJ', leader=cls.user)
+        cls.user.projects.add(cls.project)
+
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def create_issue(self, title, status=Issue.STATUS.TODO, assignee=None, tags=()):
+        issue = Issue(title=title, project=self.project, author=self.user, assignee=assignee, status=status,
+                      order=(Issue.objects.count() + 1) * ISSUE_ORDER_STEP)
+        issue._history_user = self.user
+        issue.save()
+        for name in tags:
+            IssueTagging.objects.create(issue=issue, tag=Tag.objects.create(name=name))
+        return issue
+
+    def get_ids(self, **params):
+        res = self.client.get(f'/projects/{self.project.id}/issues/', params)
+        self.assertEqual(res.status_code, 200)
+        return [issue['id'] for issue in res.data]
+
+    def test_상태_담당자_태그로_이슈를_거른다(self):
+        mine = self.create_issue('mine', assignee=self.user, tags=['bug', 'ui'])
+        done = self.create_issue('done', status=Issue.STATUS.DONE, assignee=self.user, tags=['bug'])
+        others = self.create_issue('others', assignee=self.other)
+        unassigned = self.create_issue('unassigned', status=Issue.STATUS.DOING)
+
+        self.assertEqual(self.get_ids(assignee=self.user.id, status='0,1'), [mine.id])
+        self.assertEqual(self.get_ids(assignee='none'), [unassigned.id])
+        self.assertEqual(self.get_ids(tag='bug,ui'), [mine.id, done.id])
+        self.assertEqual(self.get_ids(author=self.user.id, status='1'), [unassigned.id])
+        self.assertEqual(self.get_ids(sort='-created_at'), [unassigned.id, others.id, done.id, mine.id])
+
+    def test_수정시각과_정렬로_커서페이지네이션한다(self):
+        issues = [self.create_issue(f'issue{i}') for i in range(3)]
+        Issue.objects.filter(id=issues[0].id).update(updated_at=timezone.now() - timedelta(days=2))
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+
+        res = self.client.get(f'/projects/{self.project.id}/issues/',
+                              {'pagination': 'cursor', 'page_size': 1, 'sort': '-updated_at', 'updated_since': since})
+        self.assertEqual([issue['id'] for issue in res.data['list']], [issues[2].id])
+        res = self.client.get(f'/projects/{self.project.id}/issues/',
+                              {'pagination': 'cursor', 'page_size': 1, 'sort': '-updated_at', 'updated_since': since,
+                               'cursor': res.data['next']})
+        self.assertEqual([issue['id'] for issue in res.data['list']], [issues[1].id])
+        self.assertIsNone(res.data['next'])
+
+    def test_같은_밀리초에_만든_이슈도_생성시각순으로_모든_페이지를_돈다(self):
+        issues = [self.create_issue(f'issue{i}') for i in range(5)]
+        created_at = timezone.now().replace(microsecond=123000)
+        for i, issue in enumerate(issues):
+            Issue.objects.filter(id=issue.id).update(created_at=created_at + timedelta(microseconds=i * 100))
+
+        for sort, expected in [('created_at', issues), ('-created_at', issues[::-1])]:
+            with self.subTest(sort):
+                ids, cursor = [], None
+                for _ in range(len(issues) + 1):
+                    params = {'pagination': 'cursor', 'page_size': 2, 'sort': sort}
+                    if cursor:
+                        params['cursor'] = cursor
+                    res = self.client.get(f'/projects/{self.project.id}/issues/', params)
+                    ids += [issue['id'] for issue in res.data['list']]
+                    cursor = res.data['next']
+                    if cursor is None:
+                        break
+                self.assertIsNone(cursor)
+                self.assertEqual(ids, [issue.id for issue in expected])
+
+    def test_잘못된_필터와_정렬은_400을_돌려준다(self):
+        for params in [{'status': '9'}, {'assignee': 'me'}, {'updated_since': 'yesterday'}, {'sort': 'title'}]:
+            with self.subTest(params):
+                res = self.client.get(f'/projects/{self.project.id}/issues/', params)
+                self.assertEqual(res.status_code, 400)
+
+
+class IssueBoardTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(email='test@test.co', username='test')
+        cls.project = Project.objects.create(name='project1', key='PJ', leader=cls.user)
+        cls.user.projects.add(cls.project)
+
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def create_issue(self, title, status, order):
+        issue = Issue(title=title, project=self.project, author=self.user, status=status, order=order)
+        issue._history_user = self.user
+        issue.save()
+        return issue
+
+    def test_상태별_앞부분과_개수를_한쿼리로_읽고_열마다_더불러온다(self):
+        todo = [self.create_issue(f'todo{i}', Issue.STATUS.TODO, (3 - i) * ISSUE_ORDER_STEP) for i in range(3)]
+        done = self.create_issue('done', Issue.STATUS.DONE, ISSUE_ORDER_STEP)
+        self.client.get(f'/projects/{self.project.id}/issues/board/')  # 토큰의 사용자를 캐시해 둔다.
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(f'/projects/{self.project.id}/issues/board/', {'page_size': 2})
+        self.assertEqual(len([q for q in queries if 'issue_issue' in q['sql']]), 1)
+
+        columns = {column['status']: column for column in res.data['columns']}
+        self.assertEqual([columns[status]['count'] for status in Issue.STATUS.values], [3, 0, 1, 0])
+        self.assertEqual([issue['id'] for issue in columns[Issue.STATUS.TODO]['list']], [todo[2].id, todo[1].id])
+        self.assertEqual([issue['id'] for issue in columns[Issue.STATUS.DONE]['list']], [done.id])
+        self.assertIsNone(columns[Issue.STATUS.DONE]['next'])
+
+        res = self.client.get(f'/projects/{self.project.id}/issues/', {
+            'pagination': 'cursor', 'status': Issue.STATUS.TODO, 'page_size': 2,
+            'cursor': columns[Issue.STATUS.TODO]['next'],
+        })
+        self.assertEqual([issue['id'] for issue in res.data['list']], [todo[0].id])
@@ -1,9 +1,13 @@
 import mimetypes
+import re
 
 from django.contrib.auth import get_user_model
-from django.contrib.auth.models import Group
-from django.core.paginator import Paginator
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import Count, Exists, F, FloatField, OuterRef, Q, Value, Window
+from django.db.models.functions import Cast, RowNumber
+from django.utils.dateparse import parse_date, parse_datetime
 from django.http import FileResponse
 
 from rest_framework import status
@@ -14,14 +18,16 @@ from rest_framework.request import Request
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.response import Response
 
-from issue.models import Project, Issue, Tag, IssueTagging, IssueHistory, Participation, Team, Attachment
-from issue.pagination import DefaultPagination
-from issue.permissions import ProjectUsersOnly, ProjectLeaderOnly, IsAuthorOnly
+from accounts.groups import get_group, PROJECT_LEADER
+from issue.models import Issue, Tag, IssueTagging, Participation, Team, Attachment, Comment, \
+    IssueChange, ISSUE_ORDER_STEP, ISSUE_SEARCH_CONFIG, get_order_between, get_next_issue_order, \
+    rebalance_issue_orders
+from issue.pagination import DefaultPagination, KeysetPagination
+from issue.permissions import ProjectUsersOnly, ProjectLeaderOnly, IsAuthorOnly, get_project_membership
 from issue.serializers import ProjectSerializer, IssueSerializer, ProjectUserSerializer, IssueDetailSerializer, \
     CommentSerializer, TagSerializer, TeamSerializer, ProjectParticipationSerializer, TeamUserSerializer, \
-    AttachmentSerializer
+    AttachmentSerializer, IssueListSerializer, IssueChangeSerializer
 from smallissue.settings.base import DEFAULT_PERMISSION_CLASSES
-from smallissue.utils import get_or_none_if_pk_is_none
 from smallissue.views import DjangoGroupCompatibleAPIView
 
 User = get_user_model()
@@ -44,14 +50,14 @@ class ProjectViewSet(ModelViewSet):
         return [permission() for permission in permission_classes]
 
     def get_queryset(self):
-        return self.request.user.projects.filter(deleted_at=None).order_by('order')
+        return self.request.user.projects.order_by('order')
 
     def update(self, request, *args, **kwargs):
         project = self.get_object()
         serializer = ProjectSerializer(project, data=request.data)
 
         if serializer.is_valid():
-            group = Group.objects.get(name='project_leader')
+            group = get_group(PROJECT_LEADER)
             project.leader.groups.remove(group)
 
             serializer.save()
@@ -139,10 +145,10 @@ class ProjectParticipationViewSet(ModelViewSet):
         return super(ProjectParticipationViewSet, self).destroy(request, *args, **kwargs)
 
     def create(self, request, *args, **kwargs):
-        try:
-            project = Project.objects.get(id=self.kwargs['project_pk'])
-        except Project.DoesNotExist:
+        membership = get_project_membership(request, self.kwargs['project_pk'])
+        if membership is None:
             return Response('프로젝트가 존재하지 않습니다.', status=404)
+        project = membership.project
 
         user_id = request.data['user']
         try:
@@ -202,18 +208,195 @@ class ProjectTeamUsersViewSet(ModelViewSet):
         return Response(TeamUserSerializer(team.users, many=True).data)
 
 
+ISSUE_SEARCH_MAX_TERMS = 8
+
+
+def search_issues(queryset, q):
+    """
+    검색어의 단어마다 앞부분 일치로 제목, 본문, 댓글을 찾고 rank 를 붙인다. 단어가 없으면 ValueError.
+    Postgres 에서는 IssueSearchDocument 의 GIN 인덱스를 쓰고, 다른 DB 에서는 icontains 로 찾으며 rank 는 모두 0 이다.
+    """
+    terms = re.findall(r'\w+', q or '')[:ISSUE_SEARCH_MAX_TERMS]
+    if not terms:
+        raise ValueError('검색어를 입력해주세요.')
+
+    if connection.vendor != 'postgresql':
+        for term in terms:
+            comments = Comment.objects.filter(issue_id=OuterRef('pk'), content__icontains=term)
+            queryset = queryset.filter(Q(title__icontains=term) | Q(body__icontains=term) | Exists(comments))
+        return queryset.annotate(rank=Value(0.0, output_field=FloatField()))
+
+    query = SearchQuery(' & '.join(term + ':*' for term in terms), config=ISSUE_SEARCH_CONFIG, search_type='raw')
+    # ts_rank 는 real 이다. 커서에 담은 값과 정확히 비교할 수 있도록 double precision 으로 바꾼다.
+    return queryset.filter(search_document__vector=query) \
+        .annotate(rank=Cast(SearchRank(F('search_document__vector'), query), FloatField()))
+
+
+# sort 파라미터로 고를 수 있는 이슈 목록 정렬. 마지막 필드는 커서 페이지네이션을 위해 id 로 끝나야 한다.
+ISSUE_SORTS = {
+    'order': ('order', 'id'),
+    'created_at': ('created_at', 'id'),
+    '-created_at': ('-created_at', 'id'),
+    'updated_at': ('updated_at', 'id'),
+    '-updated_at': ('-updated_at', 'id'),
+}
+
+
+def get_issue_sort(query_params):
+    sort = query_params.get('sort') or 'order'
+    if sort not in ISSUE_SORTS:
+        raise ValueError('sort는 {} 중 하나여야 합니다.'.format(', '.join(ISSUE_SORTS)))
+    return ISSUE_SORTS[sort]
+
+
+def filter_issues(queryset, query_params):
+    """
+    status, assignee, author, tag, updated_since 로 이슈를 거른다. 잘못된 값이면 ValueError.
+    status, tag 는 쉼표로 여러 값을 줄 수 있고, assignee=none 은 담당자가 없는 이슈다.
+    태그는 JOIN 대신 EXISTS 로 걸러서 태그가 여러 개인 이슈도 한 번만 나온다.
+    """
+    try:
+        if query_params.get('status'):
+            statuses = [int(status) for status in query_params['status'].split(',')]
+            if not set(statuses) <= set(Issue.STATUS.values):
+                raise ValueError
+            queryset = queryset.filter(status__in=statuses)
+
+        assignee = query_params.get('assignee')
+        if assignee == 'none':
+            queryset = queryset.filter(assignee=None)
+        elif assignee:
+            queryset = queryset.filter(assignee_id=int(assignee))
+
+        if query_params.get('author'):
+            queryset = queryset.filter(author_id=int(query_params['author']))
+    except ValueError:
+        raise ValueError('status, assignee, author 값이 올바르지 않습니다.')
+
+    if query_params.get('tag'):
+        taggings = IssueTagging.objects.filter(issue_id=OuterRef('pk'), tag__name__in=query_params['tag'].split(','))
+        queryset = queryset.filter(Exists(taggings))
+
+    updated_since = query_params.get('updated_since')
+    if updated_since:
+        try:
+            since = parse_datetime(updated_since) or parse_date(updated_since)
+        except ValueError:
+            since = None
+        if since is None:
+            raise ValueError('updated_since는 ISO 8601 형식이어야 합니다.')
+        queryset = queryset.filter(updated_at__gte=since)
+
+    return queryset
+
+
+def get_board_columns(queryset, pagination):
+    """
+    상태별로 앞에서 pagination.page_size 개의 이슈와 상태별 전체 개수를 한 쿼리로 읽는다.
+    더 있는 상태에는 이슈 목록(?pagination=cursor&status=...)에 그대로 넘길 수 있는 다음 커서를 붙인다.
+    """
+    # 윈도우 함수 결과로는 거를 수 없으므로 서브쿼리로 감싸서 상태별 순번으로 자른다.
+    ranked = queryset.order_by().annotate(
+        row_number=Window(RowNumber(), partition_by=[F('status')],
+                          order_by=[F('order').asc(nulls_last=True), F('id').asc()]),
+        column_count=Window(Count('id'), partition_by=[F('status')]),
+    ).values('id', 'key', 'title', 'status', 'order', 'assignee_id', 'row_number', 'column_count')
+    sql, params = ranked.query.sql_with_params()
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT * FROM ({}) board WHERE row_number <= %s ORDER BY status, row_number'.format(sql),
+                       (*params, pagination.page_size))
+        names = [column[0] for column in cursor.description]
+        rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    columns = {status: {'status': status, 'count': 0, 'list': [], 'next': None} for status in Issue.STATUS.values}
+    for row in rows:
+        column = columns[row['status']]
+        column['count'] = row['column_count']
+        column['list'].append({'id': row['id'], 'key': row['key'], 'title': row['title'], 'order': row['order'],
+                               'assignee': row['assignee_id']})
+
+    for column in columns.values():
+        if column['count'] > len(column['list']):
+            last = column['list'][-1]
+            column['next'] = pagination.encode_cursor([last['order'], last['id']], reverse=False)
+    return list(columns.values())
+
+
 class ProjectIssueViewSet(ModelViewSet):
     permission_classes = [ProjectUsersOnly] + DEFAULT_PERMISSION_CLASSES
     HISTORY_PAGINATION_SIZE = 10
+    BOARD_PAGE_SIZE = 20
+
+    @property
+    def keyset_ordering(self):
+        if self.action == 'search':
+            return ('-rank', 'id')
+        return get_issue_sort(self.request.query_params)
+
+    @property
+    def paginator(self):
+        # 기존 클라이언트를 위해 목록은 기본적으로 페이지네이션하지 않고, ?pagination=cursor 일 때만 커서 페이지네이션한다.
+        # 검색 결과는 항상 커서 페이지네이션한다.
+        if not hasattr(self, '_paginator'):
+            if self.action == 'search' or self.request.query_params.get('pagination') == 'cursor':
+                self._paginator = KeysetPagination()
+            else:
+                self._paginator = None
+        return self._paginator
 
     def get_queryset(self):
-        return Issue.objects.filter(project=self.kwargs['project_pk'], deleted_at=None).order_by('order')
+        qs = Issue.objects.filter(project=self.kwargs['project_pk']).order_by('order', 'id')
+
+        if self.action in ['list', 'search']:
+            qs = IssueListSerializer.setup_eager_loading(qs)
+
+        return qs
+
+    def list(self, request, *args, **kwargs):
+        # 권한 검사(DjangoModelPermissions)도 get_queryset 을 부르므로 필터와 정렬은 여기서 건다.
+        try:
+            queryset = filter_issues(self.get_queryset(), request.query_params) \
+                .order_by(*get_issue_sort(request.query_params))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(queryset, many=True).data)
 
     def get_serializer_class(self):
         if self.action in ['retrieve', 'update']:
             return IssueDetailSerializer
+        elif self.action in ['list', 'search']:
+            return IssueListSerializer
         return IssueSerializer
 
+    @action(detail=False, methods=['GET'])
+    def search(self, request, **kwargs):
+        try:
+            qs = search_issues(filter_issues(self.get_queryset(), request.query_params), request.query_params.get('q'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
+        page = self.paginate_queryset(qs)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    @action(detail=False, methods=['GET'])
+    def board(self, request, **kwargs):
+        try:
+            qs = filter_issues(self.get_queryset(), request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
+        # 열마다 더 불러오기는 이슈 목록의 커서 페이지네이션(order, id 순)으로 한다.
+        pagination = KeysetPagination()
+        pagination.page_size = self.BOARD_PAGE_SIZE
+        pagination.page_size = pagination.get_page_size(request)
+        return Response(data={'columns': get_board_columns(qs, pagination), 'page_size': pagination.page_size},
+                        status=200)
+
     @action(detail=True, methods=['patch'])
     def toggle_subscription(self, request, **kwargs):
         issue = self.get_object()
@@ -227,17 +410,65 @@ class ProjectIssueViewSet(ModelViewSet):
 
     @action(detail=False, methods=['patch'])
     def set_orders(self, request, **kwargs):
-        issues = self.get_queryset()
+        issues = list(self.get_queryset().only('id', 'order'))
         new_orders = {}
         for i, id in enumerate(request.data.get('new_orders')):
-            new_orders[int(id)] = i
+            new_orders[int(id)] = (i + 1) * ISSUE_ORDER_STEP
 
         for issue in issues:
-            issue.order = new_orders[issue.id]
-            issue.save()
+            issue.order = new_orders.get(issue.id, issue.order)
+        Issue.objects.bulk_update(issues, ['order'], batch_size=1000)
 
         return Response(status=200)
 
+    @action(detail=True, methods=['patch'])
+    def move(self, request, **kwargs):
+        # prev 이슈와 next 이슈 사이로 이슈를 옮긴다. 맨 위/아래로 옮길 때는 prev/next 를 비워서 보낸다.
+        issue = self.get_object()
+        neighbors = {}
+        for name in ['prev', 'next']:
+            neighbor_id = request.data.get(name)
+            if neighbor_id is None:
+                neighbors[name] = None
+                continue
+
+            try:
+                neighbors[name] = self.get_queryset().only('id', 'order').get(id=neighbor_id)
+            except (Issue.DoesNotExist, ValueError):
+                return Response({'error': '{} 이슈가 존재하지 않습니다.'.format(name)}, status=400)
+
+        prev_issue, next_issue = neighbors['prev'], neighbors['next']
+        if prev_issue and next_issue and prev_issue.order is not None and next_issue.order is not None \
+                and prev_issue.order >= next_issue.order:
+            return Response({'error': 'prev 이슈가 next 이슈보다 앞에 있어야 합니다.'}, status=400)
+
+        if prev_issue is None and next_issue is None:
+            # 이웃을 하나도 주지 않으면 프로젝트의 맨 뒤로 옮긴다.
+            new_order = get_next_issue_order(issue.project_id)
+            Issue.objects.filter(id=issue.id).update(order=new_order)
+            return Response(data={'order': new_order}, status=200)
+
+        new_order = self.get_order_between_issues(prev_issue, next_issue)
+        if new_order is None:
+            # 두 이슈 사이에 남은 순서 값이 없을 때만 프로젝트 전체 순서를 다시 매긴다.
+            rebalance_issue_orders(issue.project_id)
+            for neighbor in [prev_issue, next_issue]:
+                if neighbor:
+                    neighbor.refresh_from_db(fields=['order'])
+            new_order = self.get_order_between_issues(prev_issue, next_issue)
+
+        Issue.objects.filter(id=issue.id).update(order=new_order)
+        return Response(data={'order': new_order}, status=200)
+
+    @staticmethod
+    def get_order_between_issues(prev_issue, next_issue):
+        prev_order = prev_issue.order if prev_issue else None
+        next_order = next_issue.order if next_issue else None
+
+        if (prev_issue and prev_order is None) or (next_issue and next_order is None):
+            return None
+        return get_order_between(prev_order, next_order)
+
     @action(detail=True, methods=['GET', 'POST'])
     def tags(self, request: Request, **kwargs):
         if request.method == 'POST':
@@ -279,66 +510,19 @@ class ProjectIssueViewSet(ModelViewSet):
 
     @action(detail=True, methods=['GET'])
     def history(self, request, **kwargs):
-        User = get_user_model()
         issue = self.get_object()
-        result = []
-        histories = IssueHistory.objects.filter(issue_id=issue.id)
-        paginator = Paginator(histories, self.HISTORY_PAGINATION_SIZE)
-        history_page_num = request.GET.get('page_num')
-        page_obj = paginator.get_page(history_page_num)
-
-        for issue_history in page_obj.object_list:
-            h = issue_history.history
-
-            if h.__class__ == Issue.history.model:
-                if h.prev_record:
-                    delta = h.diff_against(h.prev_record, excluded_fields=['order', 'project', ])
-                    for change in delta.changes:
-                        if change.field == 'key':
-                            continue
-
-                        data = {
-                            'field': change.field,
-                            'user': {'id': h.history_user.id, 'username': h.history_user.username},
-                            'type': h.history_type,
-                            'date': h.history_date,
-                        }
-                        if change.field == 'assignee':
-                            old_assignee = get_or_none_if_pk_is_none(User, change.old)
-                            new_assignee = get_or_none_if_pk_is_none(User, change.new)
-                            data['old_value'] = {'id': change.old,
-                                                 'username': old_assignee.username if old_assignee else None}
-                            data['new_value'] = {'id': change.new,
-                                                 'username': new_assignee.username if new_assignee else None}
-                        else:
-                            data['old_value'] = change.old
-                            data['new_value'] = change.new
-
-                        result.append(data)
-
-                else:
-                    result.append({
-                        'field': None,
-                        'old_value': None,
-                        'new_value': None,
-                        'user': {'id': h.history_user.id, 'username': h.history_user.username},
-                        'type': h.history_type,
-                        'date': h.history_date,
-                    })
-            elif h.__class__ == IssueTagging.history.model:
-                result.append({
-                    'field': 'tags',
-                    'old_value': None,
-                    'new_value': h.tag.name,
-                    'user': {'id': h.history_user.id, 'username': h.history_user.username},
-                    'type': h.history_type,
-                    'date': h.history_date
-                })
-            else:
-                raise TypeError('이슈와 이슈태깅 히스토리컬 모델이 아닙니다.')
+
+        try:
+            page_num = max(int(request.GET.get('page_num', 1)), 1)
+        except ValueError:
+            page_num = 1
+
+        offset = (page_num - 1) * self.HISTORY_PAGINATION_SIZE
+        changes = IssueChange.objects.filter(issue_id=issue.id)[offset:offset + self.HISTORY_PAGINATION_SIZE]
+        result = IssueChangeSerializer(changes, many=True).data
 
         return Response(data={'list': result, 'count': len(result), 'page_size': self.HISTORY_PAGINATION_SIZE,
-                              'current_page': page_obj.number}, status=200)
+                              'current_page': page_num}, status=200)
 
 
 class ProjectCommentViewSet(ModelViewSet):
@@ -357,8 +541,10 @@ class ProjectCommentViewSet(ModelViewSet):
         return [permission() for permission in permission_classes]
 
     def get_queryset(self):
-        return Issue.objects.get(id=self.kwargs['issue_pk'], deleted_at=None).comments.filter(deleted_at=None).order_by(
-            '-created_at')
+        # 권한 검사에서 댓글의 이슈로 프로젝트를 확인하므로 이슈를 함께 불러온다.
+        return Comment.objects.filter(issue_id=self.kwargs['issue_pk'], issue__project_id=self.kwargs['project_pk'],
+                                      issue__deleted_at=None) \
+            .select_related('issue').order_by('-created_at')
 
 
 class AttachmentViewSet(ModelViewSet):
@@ -368,7 +554,8 @@ class AttachmentViewSet(ModelViewSet):
     parser_classes = [MultiPartParser, FormParser]
 
     def get_queryset(self):
-        qs = Attachment.objects.filter(project_id=self.kwargs['project_pk']).order_by('-uploaded_at')
+        qs = Attachment.objects.filter(project_id=self.kwargs['project_pk']).select_related('author') \
+            .order_by('-uploaded_at')
         issue_id = self.request.query_params.get('issue')
 
         if issue_id:
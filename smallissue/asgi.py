@@ -11,6 +11,16 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smallissue.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smallissue.settings.production')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from accounts.stream import NOTIFICATION_STREAM_PATH, notification_stream  # noqa: E402, django 설정 이후에 불러온다.
+
+
+async def application(scope, receive, send):
+    # 알림 스트림은 연결을 오래 유지하므로 Django 를 거치지 않고 직접 처리한다.
+    if scope['type'] == 'http' and scope['path'] == NOTIFICATION_STREAM_PATH:
+        await notification_stream(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
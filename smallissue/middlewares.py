@@ -1,3 +1,7 @@
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
 def csrf_middleware(get_response):
 
     def middleware(request):
@@ -10,3 +14,23 @@ def csrf_middleware(get_response):
         return response
 
     return middleware
+
+
+class SessionRoutingMiddleware:
+    """
+    세션이 필요한 경로(settings.SESSION_PATH_PREFIXES)에서만 settings.SESSION_MIDDLEWARE 를 실행한다.
+    나머지 API 는 JWT 로 인증하므로 세션, 메시지를 읽고 쓰지 않는다.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+        handler = get_response
+        for middleware_path in reversed(settings.SESSION_MIDDLEWARE):
+            handler = import_string(middleware_path)(handler)
+        self.session_handler = handler
+
+    def __call__(self, request):
+        if request.path_info.startswith(tuple(settings.SESSION_PATH_PREFIXES)):
+            return self.session_handler(request)
+        return self.get_response(request)
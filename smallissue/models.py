@@ -3,12 +3,21 @@ from django.db import models
 from django.utils import timezone
 
 
+class AliveManager(models.Manager):
+    # 지우지 않은 행만 돌려준다. 지운 행까지 필요하면 all_objects 를 쓴다.
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at=None)
+
+
 class BaseModel(models.Model):
     id = models.AutoField(primary_key=True)
     created_at = models.DateTimeField(auto_now_add=True, help_text="생성 일시")
     updated_at = models.DateTimeField(auto_now=True, help_text="수정 일시")
     deleted_at = models.DateTimeField(null=True, blank=True, help_text="삭제 일시")
 
+    objects = AliveManager()
+    all_objects = models.Manager()
+
     class Meta:
         abstract = True
 
@@ -60,17 +60,25 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
     'smallissue.middlewares.csrf_middleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'smallissue.middlewares.SessionRoutingMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'simple_history.middleware.HistoryRequestMiddleware',
 ]
 
+# 세션을 쓰는 화면(admin, allauth, 회원가입)에서만 실행하는 미들웨어. API 는 JWT 만 쓴다.
+SESSION_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+]
+SESSION_PATH_PREFIXES = ['/admin/', '/allauth/', '/accounts/registration/']
+# admin 이 요구하는 미들웨어는 SessionRoutingMiddleware 안에서 실행된다.
+SILENCED_SYSTEM_CHECKS = ['admin.E408', 'admin.E409', 'admin.E410']
+
 ROOT_URLCONF = 'smallissue.urls'
 
 TEMPLATES = [
@@ -159,7 +167,8 @@ CORS_ALLOW_CREDENTIALS = True
 
 AUTHENTICATION_BACKENDS = [
     # Needed to login by username in Django admin, regardless of `allauth`
-    'django.contrib.auth.backends.ModelBackend',
+    # ModelBackend 에 권한 캐시를 더한 것
+    'accounts.backends.CachedModelBackend',
 
     # `allauth` specific authentication methods, such as login by e-mail
     'allauth.account.auth_backends.AuthenticationBackend',
@@ -174,13 +183,15 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.DjangoModelPermissions",
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'dj_rest_auth.jwt_auth.JWTCookieAuthentication',
+        'accounts.authentication.CachedJWTCookieAuthentication',
     ),
 }
 
 DEFAULT_PERMISSION_CLASSES = get_classes_from_string(REST_FRAMEWORK['DEFAULT_PERMISSION_CLASSES'])
 
 REST_USE_JWT = True
+# 로그인할 때 세션을 만들지 않는다. API 는 JWT 쿠키로만 인증한다.
+REST_SESSION_LOGIN = False
 
 # django-allauth
 ACCOUNT_EMAIL_REQUIRED = True
@@ -204,9 +215,21 @@ REST_AUTH_SERIALIZERS = {
 JWT_AUTH_RETURN_EXPIRATION = False
 JWT_AUTH_COOKIE = 'access'
 JWT_AUTH_REFRESH_COOKIE = 'refresh'
+# 다른 프로세스에서 블랙리스트에 넣은 토큰을 블룸 필터에 반영하는 간격(초). accounts.tokens 참고
+TOKEN_BLACKLIST_FILTER_REFRESH_INTERVAL = 10
+# 블룸 필터를 갱신할 때 이 시간(초)만큼 앞서 블랙리스트에 들어간 행도 다시 읽는다. 늦게 커밋된 행을 놓치지 않기 위해서다.
+TOKEN_BLACKLIST_FILTER_OVERLAP = 60
 
 DJANGO_NOTIFICATIONS_CONFIG = {'USE_JSONFIELD': True}
 
+# 이 필드만 바뀐 이슈 저장은 히스토리, 이슈 변경 이력, 알림을 남기지 않는다.
+ISSUE_NON_AUDITABLE_FIELDS = ['order']
+
+# 알림 스트림(accounts.stream). 'postgres' 는 LISTEN/NOTIFY, 'local' 은 같은 프로세스 안에서만 전달한다.
+NOTIFICATION_STREAM_BACKEND = 'postgres'
+# 알림이 없을 때 연결 유지를 위해 보내는 주석 이벤트 간격(초)
+NOTIFICATION_STREAM_HEARTBEAT = 15
+
 CORS_ALLOW_HEADERS = list(default_headers) + [
     'Content-Disposition'
 ]
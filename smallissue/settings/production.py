@@ -17,3 +17,16 @@ AWS_DEFAULT_ACL = None
 AWS_S3_VERIFY = True
 DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
 
+
+# 권한, 그룹, 사용자 캐시는 다른 워커에서 지운 값도 보여야 하므로 워커끼리 같은 Redis 를 쓴다.
+CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL', 'redis://redis:6379/0'),
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            # Redis 가 내려가도 요청은 캐시 없이 DB 로 처리한다.
+            'IGNORE_EXCEPTIONS': True,
+        },
+    }
+}
@@ -14,7 +14,6 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 import os
-import notifications.urls
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
@@ -25,7 +24,8 @@ from issue.urls import urlpatterns as issue_urls
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('inbox/notifications/', include(notifications.urls, namespace='notifications')),
+    # django-notifications 의 inbox 경로는 Notification.unread 만 보므로 읽음 기준(NotificationState)이 다르다.
+    # 알림은 accounts/notifications/ 로만 다룬다.
     path('accounts/', include('accounts.urls')),
     path('accounts/logout/', LogoutView.as_view(), name='logout'),
 
@@ -1,3 +1,5 @@
+from collections import defaultdict
+
 from django.db.models import Model
 
 
@@ -12,6 +14,42 @@ def get_or_none_if_pk_is_none(model: Model, pk):
     return model.objects.get(pk=pk)
 
 
+def prefetch_generic_foreign_key(instances, field_name, select_related=None):
+    """
+    instances 의 GenericForeignKey(field_name)를 content_type 별로 한 번씩만 조회해서 채워 둔다.
+    select_related: {모델: [필드, ...]} 형태로 대상 모델별 select_related 를 지정한다.
+    """
+    from django.contrib.contenttypes.models import ContentType  # settings 에서도 이 모듈을 불러오므로 지연 import
+
+    instances = list(instances)
+    if not instances:
+        return instances
+
+    field = instances[0]._meta.get_field(field_name)
+    ct_attname = instances[0]._meta.get_field(field.ct_field).get_attname()
+
+    groups = defaultdict(list)
+    for instance in instances:
+        groups[getattr(instance, ct_attname)].append(instance)
+
+    for content_type_id, group in groups.items():
+        if content_type_id is None:
+            continue
+
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        qs = model._base_manager.filter(pk__in={getattr(instance, field.fk_field) for instance in group})
+        if select_related and model in select_related:
+            qs = qs.select_related(*select_related[model])
+
+        objects = {obj.pk: obj for obj in qs}
+        for instance in group:
+            obj = objects.get(model._meta.pk.to_python(getattr(instance, field.fk_field)))
+            if obj is not None:
+                field.set_cached_value(instance, obj)
+
+    return instances
+
+
 from pydoc import locate
 
 def get_classes_from_string(string_list):